@@ -1,36 +1,145 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import Optional
-from embedder.embedder import embed_codebase
+from embedder.embedder import drop_codebase
+from embedder.jobs import job_manager, CodebaseBusy
+from embedder.uploads import save_upload, extract_code_members
+from embedder.embedding_cache import get_embedding_cache
+from embedder.providers import get_provider
+from embedder.codebases import (
+    DEFAULT_CODEBASE_ID,
+    validate_codebase_id,
+    codebase_id_from_name,
+    upload_dir,
+    list_codebases,
+)
+import asyncio
 import tempfile
-import shutil
 import os
 
 router = APIRouter()
 
 
 @router.post("/embed")
-async def embed_codebase_route(zip_file: Optional[UploadFile] = File(None)):
+async def embed_codebase_route(
+    zip_file: Optional[UploadFile] = File(None),
+    codebase_id: Optional[str] = Form(None),
+    incremental: bool = Form(True),
+    embedding_provider: Optional[str] = Form(None),
+):
     """
-    Create vector embeddings from a zipped codebase or fallback to ./sample-codebase.
+    Queue embedding of a zipped codebase or fallback to ./sample-codebase.
+    Returns a job id immediately; poll /embed/jobs/{job_id} for progress.
+    `embedding_provider` ("openai" or "local") applies to this codebase only.
+    Uploading a codebase whose job is still active is rejected with 409.
     """
     try:
+        if embedding_provider:
+            # Fail fast on unknown names instead of inside the background job
+            get_provider(embedding_provider)
         if zip_file:
-            # Handle uploaded ZIP
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                zip_path = os.path.join(tmp_dir, "codebase.zip")
-                with open(zip_path, "wb") as f:
-                    f.write(await zip_file.read())
-                shutil.unpack_archive(zip_path, tmp_dir)
-
-                embed_codebase(tmp_dir)
+            codebase_id = validate_codebase_id(codebase_id or codebase_id_from_name(zip_file.filename))
+            target_dir = upload_dir(codebase_id)
+            os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+            # Held until the job is queued, so no running job sees its files replaced
+            with job_manager.reserve(codebase_id):
+                # Stream the upload to disk, then extract only the files the embedder reads
+                with tempfile.TemporaryDirectory(dir=os.path.dirname(target_dir)) as tmp_dir:
+                    zip_path = os.path.join(tmp_dir, "codebase.zip")
+                    await save_upload(zip_file, zip_path)
+                    extraction = await asyncio.to_thread(extract_code_members, zip_path, target_dir)
+                job = job_manager.submit(
+                    target_dir,
+                    codebase_id,
+                    incremental=incremental,
+                    embedding_provider=embedding_provider,
+                )
         else:
             # Use local folder
-            local_path = "./sample-codebase"
-            if not os.path.exists(local_path):
+            codebase_path = "./sample-codebase"
+            if not os.path.exists(codebase_path):
                 return {"error": "sample-codebase directory not found"}
-            embed_codebase(local_path)
-
-        return {"message": "Embeddings created successfully"}
+            codebase_id = validate_codebase_id(codebase_id or DEFAULT_CODEBASE_ID)
+            extraction = None
+            job = job_manager.submit(
+                codebase_path,
+                codebase_id,
+                incremental=incremental,
+                embedding_provider=embedding_provider,
+            )
+        return {
+            "message": "Embedding job queued",
+            "codebase_id": codebase_id,
+            "job_id": job["job_id"],
+            "job": job,
+            "extraction": extraction,
+        }
 
+    except CodebaseBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.get("/jobs")
+def list_jobs():
+    """
+    List embedding jobs, newest first.
+    """
+    return {"jobs": job_manager.list_jobs()}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Report a job's status, files scanned, chunks embedded, throughput and ETA.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id '{job_id}'")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """
+    Cancel a queued or running embedding job.
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id '{job_id}'")
+    return job
+
+
+@router.get("/collections")
+def list_collections():
+    """
+    List embedded codebases with their size and when they were last queried.
+    """
+    return {"codebases": list_codebases()}
+
+
+@router.delete("/collections/{codebase_id}")
+def drop_collection(codebase_id: str):
+    """
+    Drop a codebase's collection and all of its local index state.
+    """
+    try:
+        codebase_id = validate_codebase_id(codebase_id)
+        # Dropping under a running job would let the worker recreate what was just deleted
+        with job_manager.reserve(codebase_id):
+            removed = drop_codebase(codebase_id)
+    except CodebaseBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Unknown codebase id '{codebase_id}'")
+    return {"message": f"Codebase '{codebase_id}' dropped"}
+
+
+@router.get("/cache/stats")
+def embedding_cache_stats():
+    """
+    Report size and hit/miss counters of the shared embedding cache.
+    """
+    return get_embedding_cache().stats()
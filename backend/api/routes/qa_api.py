@@ -1,39 +1,126 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from retriever.retriever import retrieve_code_chunks
-from langchain_openai import ChatOpenAI
+import os
+from typing import Optional
+from qa.qa import answer_question, stream_answer, answer_batch, QA_BATCH_CONCURRENCY
+from qa.context_packer import QA_CONTEXT_TOKEN_BUDGET
+from qa.answer_cache import answer_cache
+from llm.client import llm_stats
+from api.streaming import sse_event, ndjson_line, SSE_HEADERS, run_until_disconnected
 from dotenv import load_dotenv
 
 load_dotenv()
 
 router = APIRouter()
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.3)
+
+QA_BATCH_MAX_QUESTIONS = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "500"))
 
 class QARequest(BaseModel):
     question: str
     top_k: int = 5
+    codebase_id: Optional[str] = None
+    max_context_tokens: int = QA_CONTEXT_TOKEN_BUDGET
+
+
+class BatchQARequest(BaseModel):
+    questions: list[str]
+    top_k: int = 5
+    codebase_id: Optional[str] = None
+    max_context_tokens: int = QA_CONTEXT_TOKEN_BUDGET
+    concurrency: Optional[int] = None
 
 
 @router.post("/ask")
-def ask_question(request: QARequest):
+async def ask_question(request: QARequest, http_request: Request):
     """
     Answer a question using retrieved code chunks and LLM.
     """
     try:
-        # Step 1: Retrieve chunks
-        chunks = retrieve_code_chunks(request.question, top_k=request.top_k)
-        context = "\n\n".join(chunks)
-
-        # Step 2: Prompt LLM
-        prompt = (
-            f"You are an AI code assistant. Use the following code context to answer the question.\n\n"
-            f"Code Context:\n{context}\n\n"
-            f"Question: {request.question}\n\n"
-            f"Answer:"
+        return await run_until_disconnected(
+            answer_question(request.question, request.top_k, request.codebase_id, request.max_context_tokens),
+            http_request,
         )
-        response = llm.invoke(prompt)
-
-        return {"answer": response.content}
-
+    except TimeoutError:
+        return {"error": "Timed out while answering the question"}
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: QARequest, http_request: Request):
+    """
+    Stream an answer as server-sent events: a `sources` event with the packed
+    context references first, then `token` events, then `done` (or `error`).
+    Generation stops as soon as the client disconnects.
+    """
+
+    async def events():
+        try:
+            async for event, data in stream_answer(
+                request.question,
+                request.top_k,
+                request.codebase_id,
+                request.max_context_tokens,
+                is_disconnected=http_request.is_disconnected,
+            ):
+                yield sse_event(event, data)
+        except TimeoutError:
+            yield sse_event("error", {"error": "Timed out while answering the question"})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/batch")
+async def ask_questions_batch(request: BatchQARequest, http_request: Request):
+    """
+    Answer many questions about one codebase as newline-delimited JSON. Each
+    distinct context block is sent once as a `block` record; `answer` records
+    follow as questions finish and name their question by `index`, then a
+    `done` record. Pending completions are cancelled if the client disconnects.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(request.questions) > QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {QA_BATCH_MAX_QUESTIONS} questions per batch")
+    concurrency = min(request.concurrency or QA_BATCH_CONCURRENCY, QA_BATCH_CONCURRENCY)
+
+    async def records():
+        batch = answer_batch(
+            request.questions,
+            request.top_k,
+            request.codebase_id,
+            request.max_context_tokens,
+            concurrency,
+        )
+        try:
+            async for kind, data in batch:
+                if await http_request.is_disconnected():
+                    return
+                yield ndjson_line({"type": kind, **data})
+        except TimeoutError:
+            yield ndjson_line({"type": "error", "error": "Timed out while preparing the batch"})
+        except Exception as e:
+            yield ndjson_line({"type": "error", "error": str(e)})
+        finally:
+            await batch.aclose()
+
+    return StreamingResponse(records(), media_type="application/x-ndjson", headers=SSE_HEADERS)
+
+
+@router.get("/cache/stats")
+def answer_cache_statistics():
+    """
+    Report size and hit rate of the semantic answer cache.
+    """
+    return answer_cache.stats()
+
+
+@router.get("/llm/stats")
+def llm_client_statistics():
+    """
+    Report retries and rate-limit throttling of the shared LLM client.
+    """
+    return llm_stats()
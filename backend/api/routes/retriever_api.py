@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from retriever.retriever import retrieve_code_chunks
+from typing import Optional
+from retriever.retriever import retrieve_code_chunks, retrieval_cache_stats
 
 router = APIRouter()
 
@@ -8,6 +9,8 @@ router = APIRouter()
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
+    filters: Optional[dict] = None
+    codebase_id: Optional[str] = None
 
 
 @router.post("/search")
@@ -16,7 +19,17 @@ def retrieve_chunks(request: QueryRequest):
     Retrieve top-k relevant code/documentation chunks for a query.
     """
     try:
-        results = retrieve_code_chunks(request.query, top_k=request.top_k)
+        results = retrieve_code_chunks(
+            request.query, top_k=request.top_k, filters=request.filters, codebase_id=request.codebase_id
+        )
         return {"results": results}
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.get("/cache/stats")
+def retrieval_cache_statistics():
+    """
+    Report hit rates of the query-embedding and result caches.
+    """
+    return retrieval_cache_stats()
@@ -4,30 +4,78 @@ import os
 import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from summarizer.summary_generator import generate_summaries,generate_impact_summary
+from summarizer.summary_generator import generate_summaries, generate_impact_summary, stream_summaries
+from summarizer.summary_cache import get_summary_cache
+from summarizer.summary_model import to_markdown
+from embedder.codebases import resolve_codebase_path
 from fastapi import UploadFile, File, Form
 from fastapi import Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Request
+from api.streaming import sse_event, SSE_HEADERS, DISCONNECT_POLL_SECONDS
 router = APIRouter()
 
 DEFAULT_CODEBASE_PATH = "./sample-codebase"
 
 class SummaryRequest(BaseModel):
     codebase_path: str | None = None
+    codebase_id: str | None = None
+    # "markdown" for one rendered document, "json" for the codebase -> files -> chunks structure
+    format: str = "markdown"
 
-@router.post("/summary")
-async def get_codebase_summary(req: SummaryRequest):
-    codebase_path = req.codebase_path or DEFAULT_CODEBASE_PATH
-    print(codebase_path)
+def summary_path(req: SummaryRequest) -> str:
+    if req.codebase_id:
+        try:
+            codebase_path = resolve_codebase_path(req.codebase_id)
+        except (ValueError, FileNotFoundError) as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    else:
+        codebase_path = req.codebase_path or DEFAULT_CODEBASE_PATH
     if not os.path.exists(codebase_path):
         raise HTTPException(status_code=400, detail=f"Invalid path: {codebase_path}")
-    
+    return codebase_path
+
+@router.post("/summary")
+async def get_codebase_summary(req: SummaryRequest):
+    codebase_path = summary_path(req)
+    if req.format not in ("markdown", "json"):
+        raise HTTPException(status_code=400, detail=f"Unknown format '{req.format}', expected 'markdown' or 'json'")
+
     try:
         summary = await generate_summaries(codebase_path)
-        return {"summary": summary}
+        if req.format == "json":
+            return summary.to_dict()
+        return {"summary": to_markdown(summary), **summary.stats()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/summary/stream")
+async def stream_codebase_summary(req: SummaryRequest, request: Request):
+    """
+    Stream the summary as server-sent events: `start` with the file count,
+    one `file` event per finished file with progress counters, periodic
+    `progress` events while waiting, then `done` (or `error`). A client
+    disconnect cancels the outstanding LLM calls.
+    """
+    codebase_path = summary_path(req)
+
+    async def events():
+        try:
+            async for event, data in stream_summaries(
+                codebase_path,
+                is_disconnected=request.is_disconnected,
+                poll_seconds=DISCONNECT_POLL_SECONDS,
+            ):
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/summary/cache/stats")
+def summary_cache_statistics():
+    return get_summary_cache().stats()
+
 @router.post("/summary/impact")
 async def summarize_impact(
     file: UploadFile = File(None),
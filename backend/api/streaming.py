@@ -0,0 +1,45 @@
+# api/streaming.py
+
+import json
+import asyncio
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream and delaying the first byte
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def ndjson_line(data) -> str:
+    """Format one newline-delimited JSON record."""
+    return json.dumps(data) + "\n"
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+async def run_until_disconnected(coro, request):
+    """
+    Await `coro`, cancelling it if the client goes away first, so abandoned
+    requests stop consuming LLM calls. Returns None after a disconnect.
+    """
+    task = asyncio.ensure_future(coro)
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+    if task.cancelled():
+        return None
+    return task.result()
@@ -0,0 +1,148 @@
+# benchmarks/bench_retrieval.py
+#
+# Index synthetic codebases of growing size with embed_codebase and measure
+# retrieve_code_chunks quality and latency. Runs offline with the local provider.
+# Run from backend/:  python -m benchmarks.bench_retrieval --files 50,200,800 --output bench.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from benchmarks.metrics import rss_mb, peak_rss_mb, latency_summary
+from benchmarks.synthetic_codebase import generate_codebase
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark")
+    parser.add_argument("--files", default="50,200", help="Comma-separated codebase sizes, in files")
+    parser.add_argument("--classes-per-file", type=int, default=2)
+    parser.add_argument("--methods-per-class", type=int, default=4)
+    parser.add_argument("--functions-per-file", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--provider", default="local", help="Embedding provider; 'openai' needs network access")
+    parser.add_argument("--backend", default="numpy", help="Vector backend: numpy or chroma")
+    parser.add_argument("--hybrid", choices=("0", "1"), default="1", help="Fuse BM25 and symbol lookup")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    return parser.parse_args(argv)
+
+
+def first_relevant_rank(chunks: list[str], expected: str) -> int | None:
+    for rank, chunk in enumerate(chunks, start=1):
+        if expected in chunk:
+            return rank
+    return None
+
+
+def score_queries(retrieve_code_chunks, retrieval_cache, codebase_id: str, queries, k: int) -> dict:
+    by_kind = {}
+    cold, cached = [], []
+    for labeled in queries:
+        # Measure the uncached path first, then the same query served from the result cache
+        retrieval_cache.clear()
+        started = time.perf_counter()
+        chunks = retrieve_code_chunks(labeled.query, top_k=k, codebase_id=codebase_id)
+        cold.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        retrieve_code_chunks(labeled.query, top_k=k, codebase_id=codebase_id)
+        cached.append((time.perf_counter() - started) * 1000)
+
+        rank = first_relevant_rank(chunks, labeled.expected)
+        for kind in (labeled.kind, "all"):
+            stats = by_kind.setdefault(kind, {"queries": 0, "hits": 0, "reciprocal_rank": 0.0})
+            stats["queries"] += 1
+            if rank is not None:
+                stats["hits"] += 1
+                stats["reciprocal_rank"] += 1.0 / rank
+
+    quality = {
+        kind: {
+            "queries": stats["queries"],
+            # One relevant definition per query, so recall@k is the hit rate
+            f"recall@{k}": round(stats["hits"] / stats["queries"], 4),
+            "mrr": round(stats["reciprocal_rank"] / stats["queries"], 4),
+        }
+        for kind, stats in by_kind.items()
+    }
+    return {"quality": quality, "latency_cold": latency_summary(cold), "latency_cached": latency_summary(cached)}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_path = os.path.abspath(args.output) if args.output else None
+    original_cwd = os.getcwd()
+    # Configuration is read at import time, so set it before importing the pipeline
+    os.environ["EMBEDDING_PROVIDER"] = args.provider
+    os.environ["VECTOR_BACKEND"] = args.backend
+    os.environ["HYBRID_RETRIEVAL"] = args.hybrid
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+
+    report = {
+        "config": vars(args),
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        # chroma_db/, cache/ and the generated sources all live in the throwaway directory
+        os.chdir(workdir)
+        try:
+            report["runs"] = run_sizes(args, workdir)
+        finally:
+            os.chdir(original_cwd)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(output)
+    return report
+
+
+def run_sizes(args, workdir: str) -> list[dict]:
+    from embedder.embedder import embed_codebase
+    from retriever.retriever import retrieve_code_chunks, retrieval_cache
+
+    runs = []
+    for files in (int(size) for size in args.files.split(",")):
+        codebase = generate_codebase(
+            os.path.join(workdir, "sources", f"files_{files}"),
+            files=files,
+            classes_per_file=args.classes_per_file,
+            methods_per_class=args.methods_per_class,
+            functions_per_file=args.functions_per_file,
+            queries=args.queries,
+            seed=args.seed,
+        )
+        codebase_id = f"bench_{files}"
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        result = embed_codebase(codebase.root, incremental=False, codebase_id=codebase_id)
+        index_seconds = time.perf_counter() - started
+        rss_after_index = rss_mb()
+
+        scores = score_queries(retrieve_code_chunks, retrieval_cache, codebase_id, codebase.queries, args.k)
+        runs.append({
+            "files": files,
+            "functions": codebase.functions,
+            "classes": codebase.classes,
+            "chunks": result["chunks_indexed"],
+            "index_seconds": round(index_seconds, 3),
+            "chunks_per_second": round(result["chunks_indexed"] / max(index_seconds, 1e-9), 1),
+            **scores,
+            "memory_mb": {
+                "rss_index_delta": round(rss_after_index - rss_before, 1),
+                "rss_after_queries": round(rss_mb(), 1),
+                "peak_rss": round(peak_rss_mb(), 1),
+            },
+        })
+    return runs
+
+
+if __name__ == "__main__":
+    main()
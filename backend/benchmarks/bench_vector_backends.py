@@ -0,0 +1,115 @@
+# benchmarks/bench_vector_backends.py
+#
+# Compare the Chroma and NumPy vector backends on synthetic clustered vectors.
+# Run from backend/:  python -m benchmarks.bench_vector_backends --rows 200000
+
+import os
+import gc
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from retriever.vector_backends import ChromaBackend, NumpyBackend
+from benchmarks.metrics import rss_mb, latency_summary
+
+
+def make_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    # Code embeddings are clustered rather than uniform, which is what makes top-k hard
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.35 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set[str]]:
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        truth.append({f"c{i}" for i in np.argpartition(-scores, k - 1)[:k]})
+    return truth
+
+
+def bench_backend(name, backend, vectors, queries, truth, k, batch_size):
+    gc.collect()
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    for start in range(0, len(vectors), batch_size):
+        end = min(start + batch_size, len(vectors))
+        ids = [f"c{i}" for i in range(start, end)]
+        backend.upsert(
+            ids,
+            vectors[start:end].tolist() if name == "chroma" else vectors[start:end],
+            [f"chunk {i}" for i in range(start, end)],
+            [{"source": f"file_{i % 500}.py", "language": "python"} for i in range(start, end)],
+        )
+    backend.persist()
+    build_seconds = time.perf_counter() - started
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = backend.query(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(expected & {cid for cid, _ in results})
+
+    return {
+        "backend": name,
+        "build_seconds": round(build_seconds, 3),
+        **{f"query_{key}": value for key, value in latency_summary(latencies).items()},
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+    }
+
+
+def bench_numpy_reopen(directory: str, query: np.ndarray, k: int) -> dict:
+    """Cold start: open the persisted files and answer one query."""
+    started = time.perf_counter()
+    backend = NumpyBackend(directory)
+    backend.query(query, k)
+    return {"reopen_and_first_query_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector backends on synthetic vectors")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--backends", default="chroma,numpy-float16,numpy-int8")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.rows, args.dim, args.clusters, args.seed)
+    queries = make_vectors(args.queries, args.dim, args.clusters, args.seed + 1)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    report = {"config": vars(args), "results": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.backends.split(","):
+            if name == "chroma":
+                backend = ChromaBackend("bench", persist_directory=os.path.join(workdir, "chroma"))
+                result = bench_backend(name, backend, vectors, queries, truth, args.k, args.batch_size)
+            elif name.startswith("numpy-"):
+                directory = os.path.join(workdir, name)
+                backend = NumpyBackend(directory, dtype=name.split("-", 1)[1])
+                result = bench_backend(name, backend, vectors, queries, truth, args.k, args.batch_size)
+                result.update(bench_numpy_reopen(directory, queries[0], args.k))
+            else:
+                raise SystemExit(f"Unknown backend: {name}")
+            report["results"].append(result)
+            del backend
+            gc.collect()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# benchmarks/metrics.py
+
+import numpy as np
+
+
+def _proc_status_mb(field: str) -> float:
+    """A VmRSS/VmHWM style field of /proc/self/status in MiB (Linux only, else 0)."""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MiB."""
+    return _proc_status_mb("VmRSS")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    return _proc_status_mb("VmHWM")
+
+
+def latency_summary(latencies_ms: list[float]) -> dict:
+    if not latencies_ms:
+        return {"p50_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies_ms)), 3),
+    }
@@ -0,0 +1,181 @@
+# benchmarks/synthetic_codebase.py
+#
+# Deterministic synthetic Python codebases plus labeled queries built from their symbols.
+
+import os
+import random
+from dataclasses import dataclass
+
+DOMAINS = [
+    "account", "invoice", "payment", "customer", "order", "shipment", "inventory", "ledger",
+    "report", "session", "token", "profile", "catalog", "discount", "refund", "subscription",
+    "warehouse", "supplier", "budget", "forecast", "audit", "schedule", "ticket", "message",
+]
+VERBS = [
+    "calculate", "validate", "load", "store", "render", "merge", "split", "encode", "decode",
+    "reconcile", "archive", "notify", "approve", "reject", "refresh", "export", "import", "schedule",
+]
+QUALIFIERS = [
+    "total", "balance", "status", "history", "summary", "limit", "rate", "count", "window",
+    "batch", "record", "snapshot", "threshold", "currency", "region", "priority",
+]
+DESCRIPTIONS = {
+    "calculate": "compute the {q} of the {d}",
+    "validate": "check that the {d} {q} is valid",
+    "load": "read the {d} {q} from storage",
+    "store": "persist the {d} {q} to storage",
+    "render": "format the {d} {q} for display",
+    "merge": "combine two {d} {q} values",
+    "split": "break the {d} {q} into parts",
+    "encode": "serialize the {d} {q}",
+    "decode": "parse a serialized {d} {q}",
+    "reconcile": "match the {d} {q} against the ledger",
+    "archive": "move old {d} {q} entries to the archive",
+    "notify": "send a notification about the {d} {q}",
+    "approve": "mark the {d} {q} as approved",
+    "reject": "mark the {d} {q} as rejected",
+    "refresh": "recompute the cached {d} {q}",
+    "export": "write the {d} {q} to an external file",
+    "import": "bring an external {d} {q} into the system",
+    "schedule": "plan when the {d} {q} is processed",
+}
+
+# Natural-language queries reword the docstring: other verbs, and other words
+# for the qualifier, so only the domain noun is shared with the indexed text
+QUERY_PARAPHRASES = {
+    "calculate": "work out the {q} for the {d}",
+    "validate": "make sure the {q} on a {d} is correct",
+    "load": "fetch a saved {d} {q}",
+    "store": "save the {d} {q} so it survives a restart",
+    "render": "turn the {d} {q} into something a user can look at",
+    "merge": "join a pair of {d} {q}s into one",
+    "split": "divide the {d} {q} into pieces",
+    "encode": "turn the {d} {q} into a string for the network",
+    "decode": "get the {d} {q} back out of a network payload",
+    "reconcile": "cross-check the {d} {q} with the books",
+    "archive": "put aside stale {d} {q} data we no longer use",
+    "notify": "alert someone if the {d} {q} changes",
+    "approve": "sign off on the {d} {q}",
+    "reject": "turn down the {d} {q}",
+    "refresh": "make an out-of-date {d} {q} current again",
+    "export": "dump the {d} {q} out of the app",
+    "import": "pull a {d} {q} in from outside",
+    "schedule": "pick a time for handling the {d} {q}",
+}
+QUALIFIER_PARAPHRASES = {
+    "total": "sum", "balance": "remaining amount", "status": "state", "history": "past activity",
+    "summary": "overview", "limit": "cap", "rate": "ratio", "count": "number of items",
+    "window": "time range", "batch": "group", "record": "entry", "snapshot": "point-in-time copy",
+    "threshold": "cutoff", "currency": "money denomination", "region": "geographic area",
+    "priority": "urgency",
+}
+
+
+@dataclass(slots=True)
+class LabeledQuery:
+    query: str
+    kind: str
+    # A retrieved chunk is relevant when it contains this definition line
+    expected: str
+    source: str
+
+
+@dataclass(slots=True)
+class SyntheticCodebase:
+    root: str
+    files: int
+    functions: int
+    classes: int
+    queries: list
+
+
+def _function_source(rng: random.Random, name: str, verb: str, domain: str, qualifier: str,
+                     indent: str, is_method: bool, helpers: list[str]) -> str:
+    args = "self, " if is_method else ""
+    description = DESCRIPTIONS[verb].format(d=domain, q=qualifier)
+    lines = [
+        f"{indent}def {name}({args}{domain}, options=None):",
+        f'{indent}    """{description[0].upper()}{description[1:]}."""',
+        f"{indent}    options = options or {{}}",
+        f"{indent}    {qualifier} = {domain}.get('{qualifier}', {rng.randint(0, 100)})",
+    ]
+    for _ in range(rng.randint(2, 8)):
+        other = rng.choice(helpers) if helpers else "len"
+        lines.append(f"{indent}    {qualifier} = {other}({qualifier}) if options.get('{other}') else {qualifier}")
+    lines.append(f"{indent}    return {qualifier}")
+    return "\n".join(lines)
+
+
+def generate_codebase(
+    root: str,
+    files: int = 50,
+    classes_per_file: int = 2,
+    methods_per_class: int = 4,
+    functions_per_file: int = 3,
+    queries: int = 200,
+    seed: int = 13,
+) -> SyntheticCodebase:
+    """
+    Write `files` Python modules under root, spread over packages, and return
+    symbol and natural-language queries whose answers are known definitions.
+    """
+    rng = random.Random(seed)
+    used_names = set()
+    definitions = []
+
+    def unique_name(verb, domain, qualifier):
+        base = f"{verb}_{domain}_{qualifier}"
+        name, suffix = base, 2
+        while name in used_names:
+            name, suffix = f"{base}_{suffix}", suffix + 1
+        used_names.add(name)
+        return name
+
+    class_count = function_count = 0
+    for file_index in range(files):
+        package = f"pkg_{file_index % max(1, files // 10)}"
+        module_domain = rng.choice(DOMAINS)
+        rel_path = os.path.join(package, f"{module_domain}_{file_index}.py")
+        parts = [f'"""{module_domain.capitalize()} helpers, module {file_index}."""', "", "import json", ""]
+        helpers = []
+
+        for _ in range(functions_per_file):
+            verb, domain, qualifier = rng.choice(VERBS), module_domain, rng.choice(QUALIFIERS)
+            name = unique_name(verb, domain, qualifier)
+            parts += ["", _function_source(rng, name, verb, domain, qualifier, "", False, helpers), ""]
+            definitions.append((name, None, verb, domain, qualifier, rel_path))
+            helpers.append(name)
+            function_count += 1
+
+        for _ in range(classes_per_file):
+            class_domain = rng.choice(DOMAINS)
+            class_name = f"{class_domain.capitalize()}{rng.choice(QUALIFIERS).capitalize()}Service"
+            while class_name in used_names:
+                class_name += "V2"
+            used_names.add(class_name)
+            class_count += 1
+            parts += ["", f"class {class_name}:", f'    """Operations on {class_domain} data."""', ""]
+            for _ in range(methods_per_class):
+                verb, qualifier = rng.choice(VERBS), rng.choice(QUALIFIERS)
+                name = unique_name(verb, class_domain, qualifier)
+                parts += [_function_source(rng, name, verb, class_domain, qualifier, "    ", True, helpers), ""]
+                definitions.append((name, class_name, verb, class_domain, qualifier, rel_path))
+                function_count += 1
+
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(parts) + "\n")
+
+    labeled = []
+    for name, class_name, verb, domain, qualifier, rel_path in rng.sample(definitions, min(queries, len(definitions))):
+        expected = f"def {name}("
+        if len(labeled) % 2 == 0:
+            symbol = f"{class_name}.{name}" if class_name else name
+            labeled.append(LabeledQuery(f"where is `{symbol}` defined", "symbol", expected, rel_path))
+        else:
+            # Describes the behaviour without naming the symbol or reusing its docstring
+            description = QUERY_PARAPHRASES[verb].format(d=domain, q=QUALIFIER_PARAPHRASES[qualifier])
+            labeled.append(LabeledQuery(f"how do we {description}?", "natural", expected, rel_path))
+
+    return SyntheticCodebase(root, files, function_count, class_count, labeled)
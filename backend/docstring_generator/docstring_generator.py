@@ -1,8 +1,8 @@
 import ast
 import os
-from openai import AsyncOpenAI
+from llm.client import chat_text
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+DOCSTRING_MODEL = os.getenv("DOCSTRING_MODEL", "gpt-4")
 
 SUPPORTED_LANGUAGES = {"python", "javascript", "java"}
 
@@ -23,12 +23,7 @@ def extract_python_targets(source_code: str) -> list[dict]:
 
 async def generate_docstring(code_snippet: str, language: str = "python") -> str:
     prompt = f"Generate a {language} docstring for the following {language} code:\n\n{code_snippet}"
-    res = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
-    return res.choices[0].message.content.strip()
+    return await chat_text([{"role": "user", "content": prompt}], DOCSTRING_MODEL, temperature=0.2)
 
 async def insert_docstring(code: str, target: dict, docstring: str, language: str = "python") -> str:
     lines = code.splitlines()
@@ -0,0 +1,139 @@
+# embedder/batch_embedder.py
+
+import os
+import asyncio
+from embedder.embedding_cache import EmbeddingCache, get_embedding_cache
+from embedder.providers import EmbeddingProvider
+from llm.tokens import count_tokens
+from llm.retry import retry_delay, is_retryable
+
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "60000"))
+# The embeddings endpoint rejects requests with more than 2048 inputs
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "1024"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+
+
+def pack_batches(items, max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS, max_items: int = EMBEDDING_BATCH_MAX_ITEMS):
+    """
+    Group (id, text, metadata) items into request-sized batches.
+    Lazily consumes `items`, so only one batch is held in memory at a time.
+    """
+    batch, batch_tokens = [], 0
+    for item in items:
+        tokens = count_tokens(item[1])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+class BatchEmbedder:
+    """
+    Embeds chunks in token-budgeted batches with several requests in flight,
+    skipping texts that are already in the embedding cache.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        cache: EmbeddingCache | None = None,
+        max_batch_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+    ):
+        self.provider = provider
+        self.model = provider.model
+        self.dimensions = provider.dimensions
+        self.cache = (cache or get_embedding_cache()) if provider.cacheable else None
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.stats = {"batches": 0, "requests": 0, "retries": 0, "chunks": 0, "cached": 0}
+
+    async def _request(self, client, texts: list[str]) -> list[list[float]]:
+        # One request however many attempts it takes; each repeat is also a retry
+        self.stats["requests"] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.provider.aembed(client, texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(retry_delay(attempt, e))
+
+    async def _embed_batch(self, client, batch: list) -> list[list[float]]:
+        texts = [text for _, text, _ in batch]
+        if self.cache is None:
+            return await self._request(client, texts)
+        vectors = await asyncio.to_thread(self.cache.get_many, self.model, self.dimensions, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        self.stats["cached"] += len(texts) - len(missing)
+        if missing:
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = await self._request(client, unique_texts)
+            await asyncio.to_thread(self.cache.put_many, self.model, self.dimensions, unique_texts, fresh)
+            by_text = dict(zip(unique_texts, fresh))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return vectors
+
+    async def embed(self, items, write_batch):
+        """
+        Embed an iterable of (id, text, metadata) items, calling
+        write_batch(ids, texts, metadatas, vectors) in a worker thread as each batch completes.
+        Returns the number of chunks written.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        write_lock = asyncio.Lock()
+        pending = set()
+        errors = []
+        client = self.provider.async_client()
+
+        async def process(batch):
+            try:
+                vectors = await self._embed_batch(client, batch)
+                ids, texts, metadatas = (list(column) for column in zip(*batch))
+                async with write_lock:
+                    await asyncio.to_thread(write_batch, ids, texts, metadatas, vectors)
+                self.stats["batches"] += 1
+                self.stats["chunks"] += len(batch)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                semaphore.release()
+
+        # Reading files, chunking and counting tokens all happen while the
+        # generator advances, so it is advanced in a worker thread
+        batches = pack_batches(items, self.max_batch_tokens, self.max_batch_items)
+        try:
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                # Waiting here keeps at most `concurrency` batches in memory
+                await semaphore.acquire()
+                task = asyncio.create_task(process(batch))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if errors:
+                    raise errors[0]
+            if pending:
+                await asyncio.gather(*pending)
+            if errors:
+                raise errors[0]
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+        finally:
+            if client is not None:
+                await client.close()
+        return self.stats["chunks"]
+
+    def run(self, items, write_batch) -> int:
+        return asyncio.run(self.embed(items, write_batch))
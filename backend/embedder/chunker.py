@@ -0,0 +1,245 @@
+# embedder/chunker.py
+
+import os
+import ast
+import itertools
+import importlib
+from dataclasses import dataclass, field
+from llm.tokens import count_tokens
+
+try:
+    from tree_sitter import Language, Parser
+except ImportError:  # tree-sitter is optional; JS/Java fall back to line windows
+    Language = Parser = None
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+
+LANGUAGES_BY_EXTENSION = {".py": "python", ".js": "javascript", ".java": "java"}
+TREE_SITTER_MODULES = {"javascript": "tree_sitter_javascript", "java": "tree_sitter_java"}
+TREE_SITTER_DEFINITIONS = {
+    "javascript": {
+        "function_declaration", "generator_function_declaration", "class_declaration", "method_definition",
+    },
+    "java": {
+        "class_declaration", "interface_declaration", "enum_declaration", "record_declaration",
+        "annotation_type_declaration", "method_declaration", "constructor_declaration",
+    },
+}
+JS_FUNCTION_VALUES = {"arrow_function", "function", "function_expression", "generator_function", "class"}
+COMMENT_PREFIXES = ("#", "//", "/*", "*", "@")
+
+
+@dataclass(slots=True)
+class Definition:
+    name: str
+    start: int
+    end: int
+    children: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Unit:
+    start: int
+    end: int
+    symbols: list
+    tokens: int
+    group: object
+
+
+def detect_language(path: str) -> str | None:
+    return LANGUAGES_BY_EXTENSION.get(os.path.splitext(path)[1])
+
+
+# ---------- definition extraction ----------
+
+def python_definitions(body) -> list[Definition]:
+    definitions = []
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            definitions.append(Definition(node.name, start, node.end_lineno, python_definitions(node.body)))
+    return definitions
+
+
+_parsers = {}
+
+
+def get_tree_sitter_parser(language: str):
+    if language in _parsers:
+        return _parsers[language]
+    parser = None
+    if Parser is not None and language in TREE_SITTER_MODULES:
+        try:
+            module = importlib.import_module(TREE_SITTER_MODULES[language])
+            ts_language = Language(module.language())
+            try:
+                parser = Parser(ts_language)
+            except TypeError:
+                # py-tree-sitter < 0.22
+                parser = Parser()
+                parser.set_language(ts_language)
+        except (ImportError, AttributeError, TypeError, ValueError):
+            parser = None
+    _parsers[language] = parser
+    return parser
+
+
+def _node_text(node, source: bytes) -> str:
+    return source[node.start_byte:node.end_byte].decode("utf-8", errors="ignore")
+
+
+def _tree_sitter_definition(outer, node, language: str, source: bytes) -> Definition | None:
+    start, end = outer.start_point[0] + 1, outer.end_point[0] + 1
+    if language == "javascript" and node.type in ("lexical_declaration", "variable_declaration"):
+        # const handler = () => {...} and friends
+        for declarator in node.named_children:
+            value = declarator.child_by_field_name("value")
+            name = declarator.child_by_field_name("name")
+            if value is not None and name is not None and value.type in JS_FUNCTION_VALUES:
+                body = value.child_by_field_name("body")
+                children = tree_sitter_definitions(body, language, source) if body is not None else []
+                return Definition(_node_text(name, source), start, end, children)
+        return None
+    if node.type not in TREE_SITTER_DEFINITIONS[language]:
+        return None
+    name = node.child_by_field_name("name")
+    body = node.child_by_field_name("body")
+    children = tree_sitter_definitions(body, language, source) if body is not None else []
+    return Definition(_node_text(name, source) if name is not None else node.type, start, end, children)
+
+
+def tree_sitter_definitions(node, language: str, source: bytes) -> list[Definition]:
+    definitions = []
+    for child in node.named_children:
+        target = child
+        if child.type == "export_statement":
+            target = child.child_by_field_name("declaration")
+            if target is None:
+                continue
+        definition = _tree_sitter_definition(child, target, language, source)
+        if definition:
+            definitions.append(definition)
+    return definitions
+
+
+def extract_definitions(text: str, language: str | None) -> list[Definition] | None:
+    """Top-level definitions of a file, or None when it cannot be parsed."""
+    if language == "python":
+        try:
+            return python_definitions(ast.parse(text).body)
+        except (SyntaxError, ValueError):
+            return None
+    parser = get_tree_sitter_parser(language) if language else None
+    if parser is None:
+        return None
+    source = text.encode("utf-8")
+    tree = parser.parse(source)
+    return tree_sitter_definitions(tree.root_node, language, source)
+
+
+# ---------- planning ----------
+
+_group_ids = itertools.count()
+
+
+def _leading_comment_start(lines: list[str], start: int, floor: int) -> int:
+    """Pull a definition's start up over the comment/annotation block directly above it."""
+    while start - 1 >= floor and lines[start - 2].strip().startswith(COMMENT_PREFIXES):
+        start -= 1
+    return start
+
+
+def _split_lines(start, end, symbols, lines, line_tokens, max_tokens) -> list[Unit]:
+    """Split an oversized range into windows, preferring to cut at blank lines."""
+    parts = []
+    group = next(_group_ids)
+    part_start, tokens, last_blank = start, 0, None
+    for line_no in range(start, end + 1):
+        line_cost = line_tokens[line_no - 1]
+        if tokens + line_cost > max_tokens and line_no > part_start:
+            midpoint = part_start + (line_no - part_start) // 2
+            cut = last_blank if last_blank is not None and last_blank >= midpoint else line_no - 1
+            parts.append(Unit(part_start, cut, symbols, sum(line_tokens[part_start - 1:cut]), group))
+            part_start, last_blank = cut + 1, None
+            tokens = sum(line_tokens[part_start - 1:line_no - 1])
+        tokens += line_cost
+        if not lines[line_no - 1].strip():
+            last_blank = line_no
+    parts.append(Unit(part_start, end, symbols, sum(line_tokens[part_start - 1:end]), group))
+    return parts
+
+
+def _plan_units(definitions, start, end, gap_symbols, prefix, lines, line_tokens, max_tokens) -> list[Unit]:
+    units = []
+    group = next(_group_ids)
+
+    def add_range(range_start, range_end, symbols):
+        tokens = sum(line_tokens[range_start - 1:range_end])
+        if tokens == 0 or not any(lines[i].strip() for i in range(range_start - 1, range_end)):
+            return
+        if tokens > max_tokens:
+            units.extend(_split_lines(range_start, range_end, symbols, lines, line_tokens, max_tokens))
+        else:
+            units.append(Unit(range_start, range_end, symbols, tokens, group))
+
+    cursor = start
+    for definition in definitions:
+        def_start = _leading_comment_start(lines, max(definition.start, cursor), cursor)
+        if def_start > cursor:
+            add_range(cursor, def_start - 1, gap_symbols)
+        name = f"{prefix}{definition.name}"
+        tokens = sum(line_tokens[def_start - 1:definition.end])
+        if tokens > max_tokens and definition.children:
+            # Too big as a whole: emit the header/body pieces and each member separately
+            units.extend(_plan_units(
+                definition.children, def_start, definition.end, [name], f"{name}.",
+                lines, line_tokens, max_tokens,
+            ))
+        else:
+            add_range(def_start, definition.end, [name])
+        cursor = definition.end + 1
+    if cursor <= end:
+        add_range(cursor, end, gap_symbols)
+    return units
+
+
+def _pack_units(units: list[Unit], max_tokens: int) -> list[Unit]:
+    """Merge neighbouring small units of the same scope up to the token budget."""
+    packed = []
+    for unit in units:
+        last = packed[-1] if packed else None
+        if last and last.group == unit.group and last.tokens + unit.tokens <= max_tokens:
+            last.end = unit.end
+            last.tokens += unit.tokens
+            last.symbols = last.symbols + [s for s in unit.symbols if s not in last.symbols]
+        else:
+            packed.append(Unit(unit.start, unit.end, list(unit.symbols), unit.tokens, unit.group))
+    return packed
+
+
+def chunk_code(text: str, path: str, max_tokens: int = CHUNK_MAX_TOKENS) -> list[tuple[str, dict]]:
+    """
+    Split a source file on function/class boundaries into chunks of at most
+    `max_tokens` tokens. Returns (text, metadata) pairs with symbol names and
+    1-based inclusive line ranges.
+    """
+    lines = text.splitlines()
+    if not lines:
+        return []
+    language = detect_language(path)
+    line_tokens = [count_tokens(line + "\n") for line in lines]
+    definitions = extract_definitions(text, language) or []
+    units = _plan_units(definitions, 1, len(lines), [], "", lines, line_tokens, max_tokens)
+
+    chunks = []
+    for unit in _pack_units(units, max_tokens):
+        chunk_text = "\n".join(lines[unit.start - 1:unit.end])
+        metadata = {
+            "source": path,
+            "language": language or "",
+            "symbols": ",".join(unit.symbols),
+            "start_line": unit.start,
+            "end_line": unit.end,
+        }
+        chunks.append((chunk_text, metadata))
+    return chunks
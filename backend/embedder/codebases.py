@@ -0,0 +1,128 @@
+# embedder/codebases.py
+
+import os
+import re
+import json
+import time
+import shutil
+import threading
+
+CHROMA_PATH = "chroma_db"
+COLLECTIONS_DIR = os.path.join(CHROMA_PATH, "collections")
+REGISTRY_PATH = os.path.join(CHROMA_PATH, "codebases.json")
+# Extracted ZIP uploads are kept here so re-uploads can be indexed incrementally
+UPLOADS_DIR = "codebases"
+DEFAULT_CODEBASE_ID = "default"
+# Chroma collection names allow 3-63 characters of [a-zA-Z0-9._-]
+CODEBASE_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,53}$")
+LAST_USED_FLUSH_SECONDS = 60
+
+_registry_lock = threading.RLock()
+
+
+def validate_codebase_id(codebase_id: str | None) -> str:
+    codebase_id = codebase_id or DEFAULT_CODEBASE_ID
+    if not CODEBASE_ID_RE.match(codebase_id):
+        raise ValueError(
+            f"Invalid codebase id '{codebase_id}': use up to 54 letters, digits, '_' or '-', starting with a letter or digit."
+        )
+    return codebase_id
+
+
+def codebase_id_from_name(name: str) -> str:
+    """Turn an upload file name like 'my-service.zip' into a usable codebase id."""
+    stem = os.path.splitext(os.path.basename(name or ""))[0]
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "-", stem).strip("-_")[:54]
+    return slug or DEFAULT_CODEBASE_ID
+
+
+def collection_name(codebase_id: str) -> str:
+    return f"codebase_{codebase_id}"
+
+
+def codebase_state_dir(codebase_id: str) -> str:
+    """Directory holding a codebase's manifest, lexical index and index version."""
+    return os.path.join(COLLECTIONS_DIR, codebase_id)
+
+
+def upload_dir(codebase_id: str) -> str:
+    return os.path.join(UPLOADS_DIR, codebase_id)
+
+
+def _load_registry() -> dict:
+    try:
+        with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_registry(registry: dict):
+    os.makedirs(os.path.dirname(REGISTRY_PATH), exist_ok=True)
+    tmp_path = f"{REGISTRY_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, REGISTRY_PATH)
+
+
+def register_codebase(codebase_id: str, source_path: str, **details) -> dict:
+    with _registry_lock:
+        registry = _load_registry()
+        now = time.time()
+        entry = registry.get(codebase_id, {"created_at": now})
+        entry.update(details)
+        entry.update(
+            codebase_id=codebase_id,
+            collection=collection_name(codebase_id),
+            source_path=os.path.abspath(source_path),
+            updated_at=now,
+            last_used=now,
+        )
+        registry[codebase_id] = entry
+        _save_registry(registry)
+        return entry
+
+
+def get_codebase(codebase_id: str) -> dict | None:
+    with _registry_lock:
+        return _load_registry().get(codebase_id)
+
+
+def list_codebases() -> list[dict]:
+    with _registry_lock:
+        return sorted(_load_registry().values(), key=lambda entry: entry["codebase_id"])
+
+
+_last_touched = {}
+
+
+def touch_codebase(codebase_id: str):
+    """Record use of a codebase, writing the registry at most once a minute per id."""
+    now = time.time()
+    if now - _last_touched.get(codebase_id, 0) < LAST_USED_FLUSH_SECONDS:
+        return
+    _last_touched[codebase_id] = now
+    with _registry_lock:
+        registry = _load_registry()
+        if codebase_id in registry:
+            registry[codebase_id]["last_used"] = now
+            _save_registry(registry)
+
+
+def remove_codebase(codebase_id: str) -> bool:
+    """Forget a codebase and delete its local state and uploaded sources."""
+    with _registry_lock:
+        registry = _load_registry()
+        entry = registry.pop(codebase_id, None)
+        _save_registry(registry)
+    shutil.rmtree(codebase_state_dir(codebase_id), ignore_errors=True)
+    shutil.rmtree(upload_dir(codebase_id), ignore_errors=True)
+    _last_touched.pop(codebase_id, None)
+    return entry is not None
+
+
+def resolve_codebase_path(codebase_id: str) -> str:
+    entry = get_codebase(validate_codebase_id(codebase_id))
+    if entry is None:
+        raise FileNotFoundError(f"Unknown codebase id '{codebase_id}'. Embed it first.")
+    return entry["source_path"]
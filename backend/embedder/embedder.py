@@ -1,60 +1,226 @@
 # embedder/embedder.py
 
 import os
-from langchain.vectorstores import Chroma
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
+import logging
 from dotenv import load_dotenv
+from embedder.manifest import (
+    load_manifest,
+    save_manifest,
+    stat_matches,
+    chunk_id,
+)
+from embedder.providers import codebase_provider
+from embedder.batch_embedder import BatchEmbedder
+from embedder.ingest import iter_code_files, read_code_file, MAX_FILE_BYTES
+from embedder.chunker import chunk_code
+from embedder.index_version import bump_index_version
+from embedder.codebases import (
+    validate_codebase_id,
+    codebase_state_dir,
+    get_codebase,
+    register_codebase,
+    remove_codebase,
+)
+from retriever.lexical_index import LexicalIndex, LEXICAL_INDEX_FILE
+from retriever.vector_backends import VECTOR_BACKEND, open_vector_backend
 
 load_dotenv()
 
-SUPPORTED_EXTENSIONS = [".py", ".js", ".java"]
 DEFAULT_CODEBASE_DIR = "./sample-codebase"
-CHROMA_PATH = "chroma_db"
-EMBEDDING_MODEL_NAME = "text-embedding-3-small"
-
-# Initialize embedding function
-embedding_function = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
-
-def collect_code_files(directory):
-    code_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if os.path.splitext(file)[1] in SUPPORTED_EXTENSIONS:
-                code_files.append(os.path.join(root, file))
-    return code_files
-
-def load_documents_from_files(files):
-    documents = []
-    for path in files:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
-        metadata = {"source": path}
-        documents.append(Document(page_content=content, metadata=metadata))
-    return documents
-
-def chunk_documents(documents, chunk_size=500, chunk_overlap=50):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_documents(documents)
+MANIFEST_FILE = "manifest.json"
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCancelled(Exception):
+    pass
+
+def iter_changed_documents(codebase_path, manifest_files, state, incremental=True):
+    """
+    Walk the codebase and yield (rel_path, path, text) for files that are new or
+    whose content changed. Fingerprints of every kept file are recorded in
+    state["files"]; only one file's contents is held in memory at a time.
+    """
+    for path in iter_code_files(codebase_path):
+        state["checkpoint"]()
+        state["counts"]["scanned"] += 1
+        rel_path = os.path.relpath(path, codebase_path)
+        previous = manifest_files.get(rel_path)
+        stat = os.stat(path)
+        if incremental and stat_matches(previous, stat):
+            state["files"][rel_path] = previous
+            state["counts"]["unchanged"] += 1
+            continue
+
+        if stat.st_size > MAX_FILE_BYTES:
+            # Reported apart from binary and generated files so a large source file is not lost silently
+            logger.warning("Skipping %s: %d bytes exceeds EMBED_MAX_FILE_BYTES=%d", rel_path, stat.st_size, MAX_FILE_BYTES)
+            state["counts"]["too_large"] += 1
+            continue
+        result = read_code_file(path)
+        if result is None:
+            state["counts"]["skipped"] += 1
+            continue
+        text, sha256 = result
+        fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": sha256}
+        if incremental and previous and previous.get("sha256") == sha256:
+            fingerprint["chunk_ids"] = previous.get("chunk_ids", [])
+            state["files"][rel_path] = fingerprint
+            state["counts"]["unchanged"] += 1
+            continue
 
-def embed_codebase(codebase_path=None):
+        if previous:
+            state["counts"]["changed"] += 1
+            state["stale_ids"].extend(previous.get("chunk_ids", []))
+        else:
+            state["counts"]["added"] += 1
+        state["files"][rel_path] = fingerprint
+        yield rel_path, path, text
+
+def iter_chunks(documents, state, lexical_index):
+    """
+    Chunk files one at a time on syntax boundaries and yield (id, text, metadata)
+    with deterministic ids, adding each chunk to the lexical index on the way.
+    """
+    for rel_path, path, text in documents:
+        ids = []
+        for index, (chunk_text, metadata) in enumerate(chunk_code(text, path)):
+            cid = chunk_id(rel_path, index, chunk_text)
+            ids.append(cid)
+            lexical_index.add(cid, chunk_text, metadata["symbols"].split(","))
+            yield cid, chunk_text, metadata
+        state["files"][rel_path]["chunk_ids"] = ids
+
+def get_codebase_backend(codebase_id: str, backend: str | None = None, provider=None):
+    return open_vector_backend(codebase_id, backend, provider)
+
+def embed_codebase(
+    codebase_path=None,
+    incremental=True,
+    codebase_id=None,
+    progress=None,
+    cancel_event=None,
+    embedding_provider=None,
+):
+    """
+    Embed a codebase into its own vector collection as a streaming
+    walk -> read -> chunk -> embed -> write pipeline. In incremental mode only
+    files whose content hash changed since the last run are re-embedded, and
+    vectors of changed or removed files are deleted.
+
+    `progress` is called with {"files_scanned", "chunks_embedded"} as work
+    completes; setting `cancel_event` aborts the run with EmbeddingCancelled.
+    `embedding_provider` names the provider for this codebase; by default it
+    keeps the one it was built with, or EMBEDDING_PROVIDER for new codebases.
+    """
     codebase_path = codebase_path or DEFAULT_CODEBASE_DIR
-    code_files = collect_code_files(codebase_path)
-    if not code_files:
+    codebase_id = validate_codebase_id(codebase_id)
+    if not os.path.isdir(codebase_path):
+        raise ValueError(f"Codebase directory not found: {codebase_path}")
+
+    state_dir = codebase_state_dir(codebase_id)
+    lexical_index_path = os.path.join(state_dir, LEXICAL_INDEX_FILE)
+    # Without a lexical index, unchanged files would never get their chunks into it
+    if not os.path.exists(lexical_index_path):
+        incremental = False
+    entry = get_codebase(codebase_id)
+    provider = codebase_provider(entry, embedding_provider)
+    previous_backend = (entry or {}).get("vector_backend", "chroma")
+    switched_backend = entry is not None and previous_backend != VECTOR_BACKEND
+    switched_provider = entry is not None and codebase_provider(entry).spec() != provider.spec()
+    if switched_provider:
+        # Vectors from another provider live in a different space, so start from an empty store
+        get_codebase_backend(codebase_id, previous_backend, provider).drop()
+        switched_backend = False
+        incremental = False
+    elif switched_backend:
+        # Switching backends: rebuild into the new store and drop the old one once done
+        incremental = False
+    lexical_index = LexicalIndex.load(lexical_index_path)
+
+    manifest_path = os.path.join(state_dir, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path, codebase_path)
+    previous_files = manifest["files"]
+    state = {
+        "files": {},
+        "stale_ids": [],
+        "chunks_written": 0,
+        "counts": {"scanned": 0, "added": 0, "changed": 0, "unchanged": 0, "skipped": 0, "too_large": 0},
+    }
+
+    def checkpoint():
+        if cancel_event is not None and cancel_event.is_set():
+            raise EmbeddingCancelled(f"Embedding of codebase '{codebase_id}' was cancelled")
+        if progress is not None:
+            progress({"files_scanned": state["counts"]["scanned"], "chunks_embedded": state["chunks_written"]})
+
+    state["checkpoint"] = checkpoint
+
+    vector_backend = get_codebase_backend(codebase_id, provider=provider)
+
+    def write_batch(batch_ids, texts, metadatas, vectors):
+        # Vectors are computed by the batch pipeline, so write them straight to the backend
+        vector_backend.upsert(batch_ids, vectors, texts, metadatas)
+        state["chunks_written"] += len(batch_ids)
+        checkpoint()
+
+    batch_embedder = BatchEmbedder(provider)
+    documents = iter_changed_documents(codebase_path, previous_files, state, incremental)
+    chunks_indexed = batch_embedder.run(iter_chunks(documents, state, lexical_index), write_batch)
+
+    counts = state["counts"]
+    if counts["scanned"] == 0:
         raise ValueError(f"No supported code files found in: {codebase_path}")
-    
-    docs = load_documents_from_files(code_files)
-    chunks = chunk_documents(docs)
-
-    vectorstore = Chroma.from_documents(
-        documents=chunks,
-        embedding=embedding_function,
-        persist_directory=CHROMA_PATH
+
+    removed = [rel_path for rel_path in previous_files if rel_path not in state["files"]]
+    for rel_path in removed:
+        state["stale_ids"].extend(previous_files[rel_path].get("chunk_ids", []))
+    # Ids are content-addressed, so an id that was rewritten this run must survive
+    current_ids = {cid for entry in state["files"].values() for cid in entry.get("chunk_ids", [])}
+    stale_ids = [cid for cid in state["stale_ids"] if cid not in current_ids]
+    if stale_ids:
+        vector_backend.delete(stale_ids)
+        for cid in stale_ids:
+            lexical_index.remove(cid)
+    vector_backend.persist()
+    lexical_index.save(lexical_index_path)
+
+    manifest["files"] = state["files"]
+    save_manifest(manifest_path, manifest)
+    changed = chunks_indexed or stale_ids or switched_backend or switched_provider
+    index_version = bump_index_version(state_dir) if changed else None
+    register_codebase(
+        codebase_id,
+        codebase_path,
+        files=len(state["files"]),
+        chunks=len(current_ids),
+        vector_backend=VECTOR_BACKEND,
+        embedding=provider.spec(),
     )
-    vectorstore.persist()
-    return {"status": "success", "chunks_indexed": len(chunks)}
+    if switched_backend:
+        get_codebase_backend(codebase_id, previous_backend).drop()
+
+    return {
+        "status": "success",
+        "codebase_id": codebase_id,
+        "embedding_provider": provider.name,
+        "chunks_indexed": chunks_indexed,
+        "files_scanned": counts["scanned"],
+        "files_added": counts["added"],
+        "files_changed": counts["changed"],
+        "files_removed": len(removed),
+        "files_unchanged": counts["unchanged"],
+        "files_skipped": counts["skipped"],
+        "files_too_large": counts["too_large"],
+        "chunks_deleted": len(stale_ids),
+        "embedding_requests": batch_embedder.stats["requests"],
+        "embedding_retries": batch_embedder.stats["retries"],
+        "embeddings_cached": batch_embedder.stats["cached"],
+        "index_version": index_version,
+    }
 
+def drop_codebase(codebase_id: str) -> bool:
+    """Delete a codebase's vectors together with its manifest, lexical index and uploads."""
+    codebase_id = validate_codebase_id(codebase_id)
+    entry = get_codebase(codebase_id)
+    get_codebase_backend(codebase_id, (entry or {}).get("vector_backend")).drop()
+    return remove_codebase(codebase_id)
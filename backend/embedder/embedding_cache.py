@@ -0,0 +1,89 @@
+# embedder/embedding_cache.py
+
+import os
+import threading
+from array import array
+from langchain.embeddings.base import Embeddings
+from storage.sqlite_lru import SQLiteLRU, sha256_hex
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+
+class EmbeddingCache:
+    """Disk-backed LRU cache of embedding vectors keyed by (model, dimensions, sha256(text))."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.table = SQLiteLRU(
+            path,
+            "embeddings",
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )
+            """,
+            key_column="text_hash",
+            value_column="vector",
+            max_entries=max_entries,
+        )
+
+    def get_many(self, model: str, dimensions: int, texts: list[str]) -> list[list[float] | None]:
+        blobs = self.table.get_many({"model": model, "dimensions": dimensions}, [sha256_hex(t) for t in texts])
+        return [array("f", blob).tolist() if blob is not None else None for blob in blobs]
+
+    def put_many(self, model: str, dimensions: int, texts: list[str], vectors: list[list[float]]):
+        self.table.put_many([
+            {"model": model, "dimensions": dimensions, "text_hash": sha256_hex(t), "vector": array("f", v).tobytes()}
+            for t, v in zip(texts, vectors)
+        ])
+
+    def stats(self) -> dict:
+        return self.table.stats()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache shared by the embedder and the retriever."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an Embeddings implementation so only cache misses reach the API."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache | None = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.dimensions = getattr(embeddings, "dimensions", None) or 0
+        self.cache = cache or get_embedding_cache()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.cache.get_many(self.model_name, self.dimensions, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Embed each distinct missing text once, even if it repeats in the batch
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = self.embeddings.embed_documents(unique_texts)
+            self.cache.put_many(self.model_name, self.dimensions, unique_texts, fresh)
+            by_text = dict(zip(unique_texts, fresh))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        (vector,) = self.cache.get_many(self.model_name, self.dimensions, [text])
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model_name, self.dimensions, [text], [vector])
+        return vector
@@ -0,0 +1,28 @@
+# embedder/index_version.py
+
+import os
+import time
+import uuid
+
+INDEX_VERSION_FILE = "index_version"
+
+
+def read_index_version(chroma_path: str) -> str | None:
+    path = os.path.join(chroma_path, INDEX_VERSION_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def bump_index_version(chroma_path: str) -> str:
+    """Record that the index changed so long-lived readers reopen it."""
+    version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(chroma_path, exist_ok=True)
+    path = os.path.join(chroma_path, INDEX_VERSION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
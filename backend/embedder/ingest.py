@@ -0,0 +1,126 @@
+# embedder/ingest.py
+
+import os
+import hashlib
+import fnmatch
+
+SUPPORTED_EXTENSIONS = [".py", ".js", ".java"]
+VENDORED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "venv", ".venv", "env",
+    "__pycache__", "site-packages", "dist", "build", "target", "vendor", ".tox", ".mypy_cache",
+}
+MAX_FILE_BYTES = int(os.getenv("EMBED_MAX_FILE_BYTES", str(1024 * 1024)))
+SNIFF_BYTES = 8192
+# Minified bundles and generated tables have very long lines and are useless to embed
+MAX_AVERAGE_LINE_LENGTH = 400
+GENERATED_MARKERS = (b"@generated", b"DO NOT EDIT", b"Generated by the protocol buffer compiler")
+
+
+class IgnoreRules:
+    """Minimal .gitignore matcher: basename globs, anchored paths, dir-only and negated patterns."""
+
+    def __init__(self, base_dir: str, patterns: list[str]):
+        self.base_dir = base_dir
+        self.patterns = patterns
+
+    @classmethod
+    def from_directory(cls, directory: str):
+        path = os.path.join(directory, ".gitignore")
+        if not os.path.isfile(path):
+            return None
+        patterns = []
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    patterns.append(line)
+        return cls(directory, patterns) if patterns else None
+
+    def match(self, path: str, is_dir: bool) -> bool | None:
+        rel_path = os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+        name = os.path.basename(path)
+        result = None
+        for pattern in self.patterns:
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            if pattern.endswith("/"):
+                if not is_dir:
+                    continue
+                pattern = pattern.rstrip("/")
+            if "/" in pattern:
+                matched = fnmatch.fnmatch(rel_path, pattern.lstrip("/"))
+            else:
+                matched = fnmatch.fnmatch(name, pattern)
+            if matched:
+                result = not negate
+        return result
+
+
+def is_ignored(path: str, is_dir: bool, rules: list[IgnoreRules]) -> bool:
+    ignored = False
+    for rule in rules:
+        matched = rule.match(path, is_dir)
+        if matched is not None:
+            ignored = matched
+    return ignored
+
+
+def iter_code_files(directory: str):
+    """Walk a tree lazily, pruning vendored and git-ignored directories."""
+    stack = [(directory, [])]
+    while stack:
+        current, inherited_rules = stack.pop()
+        rules = inherited_rules
+        local_rules = IgnoreRules.from_directory(current)
+        if local_rules:
+            rules = inherited_rules + [local_rules]
+        try:
+            entries = sorted(os.scandir(current), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_symlink():
+                continue
+            if entry.is_dir():
+                if entry.name in VENDORED_DIRS or is_ignored(entry.path, True, rules):
+                    continue
+                subdirs.append((entry.path, rules))
+            elif entry.is_file():
+                if os.path.splitext(entry.name)[1] not in SUPPORTED_EXTENSIONS:
+                    continue
+                if is_ignored(entry.path, False, rules):
+                    continue
+                yield entry.path
+        # Reverse so the stack pops directories in name order
+        stack.extend(reversed(subdirs))
+
+
+def looks_generated(head: bytes, size: int) -> bool:
+    if b"\0" in head:
+        return True
+    if any(marker in head for marker in GENERATED_MARKERS):
+        return True
+    newlines = head.count(b"\n")
+    sample = min(size, len(head))
+    return sample > 0 and sample / (newlines + 1) > MAX_AVERAGE_LINE_LENGTH
+
+
+def read_code_file(path: str, max_bytes: int = MAX_FILE_BYTES):
+    """
+    Read a source file and return (text, sha256), or None if the file is
+    binary, oversized or looks generated. Only the first SNIFF_BYTES are read
+    for files that get rejected.
+    """
+    size = os.path.getsize(path)
+    if size > max_bytes:
+        return None
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        if looks_generated(head, size):
+            return None
+        data = head + f.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+    text = data.decode("utf-8", errors="ignore")
+    return text, sha256
@@ -0,0 +1,257 @@
+# embedder/jobs.py
+
+import os
+import copy
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from embedder.embedder import embed_codebase, EmbeddingCancelled
+from embedder.ingest import iter_code_files
+from embedder.codebases import CHROMA_PATH
+
+JOBS_DIR = os.path.join(CHROMA_PATH, "jobs")
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+PROGRESS_FLUSH_SECONDS = 2.0
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class CodebaseBusy(RuntimeError):
+    pass
+
+
+class EmbeddingJobManager:
+    """
+    Runs embed_codebase in a worker pool and tracks each run as a job persisted
+    under chroma_db/jobs, so progress can be polled and unfinished jobs resumed
+    after a restart.
+    """
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, max_workers: int = EMBED_WORKERS):
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._cancel_events = {}
+        self._reserved = set()
+        self._lock = threading.RLock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed-job")
+        return self._executor
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        return copy.deepcopy({k: v for k, v in job.items() if not k.startswith("_")})
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job: dict):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._job_path(job["job_id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _load_all(self) -> list[dict]:
+        if not os.path.isdir(self.jobs_dir):
+            return []
+        jobs = []
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return jobs
+
+    def active_job(self, codebase_id: str) -> dict | None:
+        with self._lock:
+            for job in self._jobs.values():
+                if job["codebase_id"] == codebase_id and job["status"] in ACTIVE_STATUSES:
+                    return self._public(job)
+        return None
+
+    @contextmanager
+    def reserve(self, codebase_id: str):
+        """
+        Hold a codebase while its files are replaced and its job is submitted,
+        or while it is dropped. Raises CodebaseBusy if a job is embedding it or
+        another request holds it, since changing files under a running job breaks that job.
+        """
+        with self._lock:
+            active = self.active_job(codebase_id)
+            if active is not None:
+                raise CodebaseBusy(f"Codebase '{codebase_id}' is being embedded by job {active['job_id']}")
+            if codebase_id in self._reserved:
+                raise CodebaseBusy(f"Codebase '{codebase_id}' is being uploaded or dropped")
+            self._reserved.add(codebase_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved.discard(codebase_id)
+
+    def submit(
+        self,
+        codebase_path: str,
+        codebase_id: str,
+        incremental: bool = True,
+        embedding_provider: str | None = None,
+    ) -> dict:
+        """Queue an embedding job; an already active job for the same codebase is returned instead."""
+        with self._lock:
+            active = self.active_job(codebase_id)
+            if active is not None:
+                return active
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "codebase_id": codebase_id,
+                "codebase_path": os.path.abspath(codebase_path),
+                "incremental": incremental,
+                "embedding_provider": embedding_provider,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "attempts": 0,
+                "progress": {
+                    "files_total": None,
+                    "files_scanned": 0,
+                    "chunks_embedded": 0,
+                    "files_per_second": 0.0,
+                    "chunks_per_second": 0.0,
+                    "eta_seconds": None,
+                },
+                "result": None,
+                "error": None,
+            }
+            self._enqueue(job)
+            return self._public(job)
+
+    def _enqueue(self, job: dict):
+        self._jobs[job["job_id"]] = job
+        self._cancel_events[job["job_id"]] = threading.Event()
+        self._save(self._public(job))
+        self._pool().submit(self._run, job["job_id"])
+
+    def _update_progress(self, job: dict, update: dict, force: bool = False):
+        with self._lock:
+            progress = job["progress"]
+            progress.update(update)
+            elapsed = max(time.time() - job["started_at"], 1e-6)
+            progress["files_per_second"] = round(progress["files_scanned"] / elapsed, 2)
+            progress["chunks_per_second"] = round(progress["chunks_embedded"] / elapsed, 2)
+            if progress["files_total"] and progress["files_per_second"]:
+                remaining = max(progress["files_total"] - progress["files_scanned"], 0)
+                progress["eta_seconds"] = round(remaining / progress["files_per_second"], 1)
+            now = time.monotonic()
+            if force or now - job.get("_flushed_at", 0) >= PROGRESS_FLUSH_SECONDS:
+                job["_flushed_at"] = now
+                self._save(self._public(job))
+
+    def _finish(self, job: dict, status: str, result=None, error=None):
+        with self._lock:
+            job.update(status=status, finished_at=time.time(), result=result, error=error)
+            if status == "succeeded":
+                job["progress"]["eta_seconds"] = 0.0
+            self._save(self._public(job))
+            self._cancel_events.pop(job["job_id"], None)
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            cancel_event = self._cancel_events.get(job_id)
+            if job["status"] != "queued" or cancel_event is None:
+                return
+            job.update(status="running", started_at=time.time(), attempts=job["attempts"] + 1)
+            self._save(self._public(job))
+        if cancel_event.is_set():
+            self._finish(job, "cancelled")
+            return
+        try:
+            files_total = sum(1 for _ in iter_code_files(job["codebase_path"]))
+            self._update_progress(job, {"files_total": files_total}, force=True)
+            result = embed_codebase(
+                job["codebase_path"],
+                incremental=job["incremental"],
+                codebase_id=job["codebase_id"],
+                progress=lambda update: self._update_progress(job, update),
+                cancel_event=cancel_event,
+                embedding_provider=job.get("embedding_provider"),
+            )
+            self._update_progress(job, {}, force=True)
+            self._finish(job, "succeeded", result=result)
+        except EmbeddingCancelled as e:
+            if job.get("_interrupted"):
+                # Shutting down: leave it queued on disk so the next start resumes it
+                with self._lock:
+                    job["status"] = "queued"
+                    self._save(self._public(job))
+            else:
+                self._finish(job, "cancelled", error=str(e))
+        except Exception as e:
+            self._finish(job, "failed", error=str(e))
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._public(job)
+        path = self._job_path(job_id)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return None
+
+    def list_jobs(self) -> list[dict]:
+        jobs = {job["job_id"]: job for job in self._load_all()}
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                jobs[job_id] = self._public(job)
+        return sorted(jobs.values(), key=lambda job: job["created_at"], reverse=True)
+
+    def cancel(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ACTIVE_STATUSES:
+                return self.get(job_id)
+            self._cancel_events[job_id].set()
+            if job["status"] == "queued":
+                self._finish(job, "cancelled")
+            return self.get(job_id)
+
+    def resume_pending(self) -> list[str]:
+        """Re-queue jobs a previous process left queued or running. Already-embedded chunks come from the cache."""
+        resumed = []
+        with self._lock:
+            for job in self._load_all():
+                if job["status"] in ACTIVE_STATUSES and job["job_id"] not in self._jobs:
+                    if not os.path.isdir(job["codebase_path"]):
+                        job.update(status="failed", finished_at=time.time(), error="Codebase path no longer exists")
+                        self._save(job)
+                        continue
+                    job["status"] = "queued"
+                    self._enqueue(job)
+                    resumed.append(job["job_id"])
+        return resumed
+
+    def shutdown(self):
+        """Interrupt running jobs without marking them cancelled, so they resume on next start."""
+        with self._lock:
+            for job_id, event in self._cancel_events.items():
+                self._jobs[job_id]["_interrupted"] = True
+                event.set()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+job_manager = EmbeddingJobManager()
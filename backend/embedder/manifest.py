@@ -0,0 +1,53 @@
+# embedder/manifest.py
+
+import os
+import json
+import hashlib
+
+MANIFEST_VERSION = 1
+
+
+def empty_manifest(codebase_path: str) -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "codebase_path": os.path.abspath(codebase_path),
+        "files": {},
+    }
+
+
+def load_manifest(path: str, codebase_path: str) -> dict:
+    if not os.path.exists(path):
+        return empty_manifest(codebase_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest(codebase_path)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest(codebase_path)
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict):
+    # Write to a temp file and swap it in so a crash never leaves a torn manifest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def stat_matches(previous: dict | None, stat: os.stat_result) -> bool:
+    """True when a manifest entry still matches the file's size and mtime, so hashing can be skipped."""
+    return bool(previous) and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns
+
+
+def chunk_id(rel_path: str, index: int, text: str) -> str:
+    """Deterministic vector id for the index-th chunk of a file."""
+    digest = hashlib.sha256()
+    digest.update(rel_path.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(index).encode("ascii"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,183 @@
+# embedder/providers.py
+
+import os
+import math
+import zlib
+import asyncio
+import threading
+from collections import Counter
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from retriever.lexical_index import IDENTIFIER_RE, tokenize
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "512"))
+# Bump when the local feature extraction changes, so cached or stored vectors are not mixed
+LOCAL_EMBEDDING_VERSION = 1
+
+# Relative weights of the local provider's hashed features
+TOKEN_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.25
+
+
+class EmbeddingProvider(Embeddings):
+    """
+    Turns texts into vectors for one collection. `model` identifies the vector
+    space in the embedding cache; `cacheable` is False for providers cheaper to
+    recompute than to look up.
+    """
+
+    name = "base"
+    cacheable = True
+
+    def __init__(self, model: str, dimensions: int = 0):
+        self.model = model
+        self.dimensions = dimensions
+
+    def spec(self) -> dict:
+        """What is recorded in the codebase registry to reopen this provider."""
+        return {"provider": self.name, "model": self.model, "dimensions": self.dimensions}
+
+    def async_client(self):
+        """Client shared by one run's concurrent requests, closed with `await client.close()`."""
+        return None
+
+    async def aembed(self, client, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class OpenAIProvider(EmbeddingProvider):
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, dimensions: int = 0):
+        super().__init__(model, dimensions)
+        self._embeddings = None
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        # Created on first use so importing the app needs neither a key nor the network
+        with self._lock:
+            if self._embeddings is None:
+                from langchain.embeddings import OpenAIEmbeddings
+
+                kwargs = {"dimensions": self.dimensions} if self.dimensions else {}
+                self._embeddings = OpenAIEmbeddings(model=self.model, **kwargs)
+            return self._embeddings
+
+    def async_client(self):
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+    async def aembed(self, client, texts: list[str]) -> list[list[float]]:
+        kwargs = {"model": self.model, "input": texts}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+        response = await client.embeddings.create(**kwargs)
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class LocalHashingProvider(EmbeddingProvider):
+    """
+    Offline CPU embeddings: identifier tokens, adjacent-token bigrams and
+    character trigrams of identifiers are hashed into a fixed number of signed
+    buckets (the hashing trick), weighted by sublinear term frequency and
+    L2-normalised. Deterministic, so vectors never need re-embedding.
+    """
+
+    name = "local"
+    # Hashing a chunk is cheaper than a SQLite round trip
+    cacheable = False
+
+    def __init__(self, model: str | None = None, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS):
+        dimensions = dimensions or LOCAL_EMBEDDING_DIMENSIONS
+        super().__init__(model or f"local-hash-v{LOCAL_EMBEDDING_VERSION}", dimensions)
+
+    def _features(self, text: str) -> Counter:
+        features = Counter()
+        tokens = tokenize(text)
+        for token in tokens:
+            features["t:" + token] += TOKEN_WEIGHT
+        for left, right in zip(tokens, tokens[1:]):
+            features[f"b:{left} {right}"] += BIGRAM_WEIGHT
+        # Trigrams let misspelt or partially typed identifiers still land nearby
+        for identifier in set(IDENTIFIER_RE.findall(text.lower())):
+            padded = f"<{identifier}>"
+            for i in range(len(padded) - 2):
+                features["c:" + padded[i:i + 3]] += TRIGRAM_WEIGHT
+        return features
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.fromiter((_hash(f) for f in features), dtype=np.uint32, count=len(features))
+            weights = np.fromiter((1 + math.log(w) if w >= 1 else w for w in features.values()),
+                                  dtype=np.float32, count=len(features))
+            # The top hash bit picks the sign so colliding features tend to cancel, not pile up
+            signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+            matrix[row] = np.bincount(hashes % self.dimensions, weights=weights * signs, minlength=self.dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+
+# Codebases registered before providers were configurable were embedded with this
+LEGACY_EMBEDDING_SPEC = {"provider": "openai", "model": "text-embedding-3-small", "dimensions": 0}
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    LocalHashingProvider.name: LocalHashingProvider,
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(spec: dict | str | None = None) -> EmbeddingProvider:
+    """
+    Provider for a registry spec ({"provider", "model", "dimensions"}) or a
+    provider name; defaults to EMBEDDING_PROVIDER. Instances are shared per spec.
+    """
+    if spec is None or isinstance(spec, str):
+        spec = {"provider": spec or EMBEDDING_PROVIDER}
+    name = spec.get("provider") or EMBEDDING_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Choose one of: {', '.join(PROVIDERS)}")
+    key = (name, spec.get("model"), spec.get("dimensions"))
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            kwargs = {k: spec[k] for k in ("model", "dimensions") if spec.get(k) is not None}
+            provider = _providers[key] = PROVIDERS[name](**kwargs)
+        return provider
+
+
+def codebase_provider(entry: dict | None, requested: str | None = None) -> EmbeddingProvider:
+    """
+    Provider for a registered codebase. A codebase keeps the provider it was
+    built with unless a different provider name is explicitly requested.
+    """
+    previous = entry.get("embedding", LEGACY_EMBEDDING_SPEC) if entry else None
+    if requested and (previous is None or previous.get("provider") != requested):
+        return get_provider(requested)
+    return get_provider(previous)
@@ -0,0 +1,107 @@
+# embedder/uploads.py
+
+import os
+import shutil
+import zipfile
+import aiofiles
+from embedder.ingest import SUPPORTED_EXTENSIONS, VENDORED_DIRS, MAX_FILE_BYTES
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+MAX_ZIP_MEMBERS = int(os.getenv("MAX_ZIP_MEMBERS", "200000"))
+MAX_EXTRACTED_BYTES = int(os.getenv("MAX_EXTRACTED_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Source code compresses ~5-10x; anything far beyond that is a zip bomb
+MAX_COMPRESSION_RATIO = int(os.getenv("MAX_COMPRESSION_RATIO", "100"))
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+async def save_upload(upload_file, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+    """Stream an UploadFile to disk in fixed-size chunks, enforcing a size cap."""
+    written = 0
+    async with aiofiles.open(dest_path, "wb") as f:
+        while True:
+            block = await upload_file.read(UPLOAD_CHUNK_BYTES)
+            if not block:
+                break
+            written += len(block)
+            if written > max_bytes:
+                raise UploadRejected(f"Upload exceeds the {max_bytes} byte limit")
+            await f.write(block)
+    return written
+
+
+def _is_wanted(name: str) -> bool:
+    parts = name.replace("\\", "/").split("/")
+    if any(part in VENDORED_DIRS for part in parts[:-1]):
+        return False
+    return os.path.splitext(parts[-1])[1] in SUPPORTED_EXTENSIONS
+
+
+def _safe_target(root: str, name: str) -> str | None:
+    target = os.path.normpath(os.path.join(root, name))
+    if os.path.isabs(name) or not target.startswith(os.path.abspath(root) + os.sep):
+        return None
+    return target
+
+
+def extract_code_members(zip_path: str, target_dir: str) -> dict:
+    """
+    Extract only supported source files from a ZIP into target_dir, streaming
+    each member to disk. Rejects archives that exceed member-count, total-size
+    or compression-ratio limits. Extraction happens in a side directory that
+    is swapped in only on success. The swap is two renames, not atomic, so
+    callers must make sure no embedding job is reading target_dir.
+    """
+    if not zipfile.is_zipfile(zip_path):
+        raise UploadRejected("Only ZIP archives are supported")
+
+    extract_dir = os.path.abspath(f"{target_dir}.extracting")
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    os.makedirs(extract_dir)
+    stats = {"members": 0, "extracted": 0, "skipped": 0, "bytes_extracted": 0}
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = archive.infolist()
+            stats["members"] = len(members)
+            if len(members) > MAX_ZIP_MEMBERS:
+                raise UploadRejected(f"Archive has {len(members)} members; the limit is {MAX_ZIP_MEMBERS}")
+
+            for info in members:
+                if info.is_dir() or not _is_wanted(info.filename) or info.file_size > MAX_FILE_BYTES:
+                    stats["skipped"] += 1
+                    continue
+                target = _safe_target(extract_dir, info.filename)
+                if target is None:
+                    raise UploadRejected(f"Unsafe path in archive: {info.filename}")
+                if info.compress_size and info.file_size / info.compress_size > MAX_COMPRESSION_RATIO:
+                    raise UploadRejected(f"Suspicious compression ratio for {info.filename}")
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                written = 0
+                with archive.open(info) as source, open(target, "wb") as dest:
+                    # Count real bytes rather than trusting the header sizes
+                    while True:
+                        block = source.read(UPLOAD_CHUNK_BYTES)
+                        if not block:
+                            break
+                        written += len(block)
+                        if written > info.file_size or stats["bytes_extracted"] + written > MAX_EXTRACTED_BYTES:
+                            raise UploadRejected("Archive expands beyond the allowed size")
+                        dest.write(block)
+                stats["extracted"] += 1
+                stats["bytes_extracted"] += written
+
+        if stats["extracted"] == 0:
+            raise UploadRejected("Archive contains no supported code files")
+        previous_dir = f"{extract_dir}.previous"
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if os.path.exists(target_dir):
+            os.replace(target_dir, previous_dir)
+        os.replace(extract_dir, target_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+    return stats
@@ -0,0 +1,256 @@
+# llm/client.py
+#
+# The one place chat completions are requested from. Every caller shares, per
+# event loop, an AsyncOpenAI client over a pooled (HTTP/2 when available)
+# httpx client, one retry policy and a process-wide request/token budget.
+
+import os
+import time
+import asyncio
+import logging
+import weakref
+import functools
+import threading
+import httpx
+from openai import AsyncOpenAI
+from llm.tokens import count_tokens
+from llm.retry import retry_delay, is_retryable
+
+# Point LLM_BASE_URL at any OpenAI-compatible server to replace the hosted API
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4.1-mini")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "90"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# Process-wide budget; 0 disables a limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+# Assumed completion size when a call sets no max_tokens
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "500"))
+
+logger = logging.getLogger(__name__)
+
+
+class RateBudget:
+    """
+    Token buckets for requests and tokens per minute, shared by every caller
+    in the process. A 429 pauses the whole budget for the server's retry
+    delay, so callers back off together instead of each finding the limit.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _try_take(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens, or return seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            # A request larger than the whole bucket waits for a full bucket rather than forever
+            tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+            waits = [0.0]
+            if self.requests_per_minute and self._requests < 1:
+                waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+            if tokens and self._tokens < tokens:
+                waits.append((tokens - self._tokens) * 60 / self.tokens_per_minute)
+            wait = max(waits)
+            if wait == 0:
+                self._requests -= 1
+                self._tokens -= tokens
+            return wait
+
+    async def acquire(self, tokens: int):
+        while True:
+            wait = self._try_take(tokens)
+            if wait == 0:
+                return
+            self.throttled += 1
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once a response reports its real usage."""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + estimated - actual)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+rate_budget = RateBudget()
+retry_stats = {"requests": 0, "retries": 0, "failures": 0}
+
+# One client, and so one connection pool, per event loop
+_clients = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=1)
+def _use_http2() -> bool:
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("h2 is not installed, LLM client falls back to HTTP/1.1")
+        return False
+
+
+def _http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_use_http2(),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+    )
+
+
+def get_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOpenAI(
+            api_key=LLM_API_KEY,
+            base_url=LLM_BASE_URL,
+            # Retries happen here, where they can see the shared budget
+            max_retries=0,
+            http_client=_http_client(),
+        )
+    return client
+
+
+async def close_client():
+    """Close the running loop's client and its connections; call before the loop shuts down."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int | None = None) -> int:
+    prompt = sum(count_tokens(message.get("content") or "") + 4 for message in messages)
+    return prompt + (max_tokens or LLM_COMPLETION_TOKEN_ESTIMATE)
+
+
+async def _create(messages: list[dict], model: str | None, **kwargs):
+    estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+    retry_stats["requests"] += 1
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await rate_budget.acquire(estimate)
+        try:
+            return estimate, await get_client().chat.completions.create(
+                model=model or LLM_MODEL,
+                messages=messages,
+                **kwargs,
+            )
+        except Exception as e:
+            # A failed attempt produced nothing, so it gives its tokens back
+            rate_budget.settle(estimate, 0)
+            if attempt == LLM_MAX_RETRIES or not is_retryable(e):
+                retry_stats["failures"] += 1
+                raise
+            retry_stats["retries"] += 1
+            delay = retry_delay(attempt, e)
+            if getattr(e, "status_code", None) == 429:
+                rate_budget.pause(delay)
+            await asyncio.sleep(delay)
+
+
+async def chat(messages: list[dict], model: str | None = None, **kwargs):
+    """A chat completion, retried on rate limits, timeouts and server errors."""
+    estimate, response = await _create(messages, model, **kwargs)
+    # OpenAI-compatible stand-ins do not always report usage
+    actual = getattr(response.usage, "total_tokens", None)
+    if actual:
+        rate_budget.settle(estimate, actual)
+    return response
+
+
+async def chat_text(messages: list[dict], model: str | None = None, **kwargs) -> str:
+    response = await chat(messages, model, **kwargs)
+    return (response.choices[0].message.content or "").strip()
+
+
+class SettledStream:
+    """
+    A streamed completion that settles the rate budget when it ends, with the
+    usage chunk's total if the server sent one and the estimate otherwise.
+    """
+
+    def __init__(self, stream, estimate: int):
+        self._stream = stream
+        self._estimate = estimate
+        self._actual = None
+        self._settled = False
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                usage = getattr(chunk, "usage", None)
+                if getattr(usage, "total_tokens", None):
+                    self._actual = usage.total_tokens
+                yield chunk
+        finally:
+            self._settle()
+
+    def _settle(self):
+        if not self._settled:
+            self._settled = True
+            rate_budget.settle(self._estimate, self._actual or self._estimate)
+
+    async def close(self):
+        self._settle()
+        await self._stream.close()
+
+
+async def chat_stream(messages: list[dict], model: str | None = None, **kwargs) -> SettledStream:
+    """
+    Open a streamed chat completion. Only opening the stream is retried; the
+    caller iterates and must close it.
+    """
+    estimate, stream = await _create(messages, model, stream=True, **kwargs)
+    return SettledStream(stream, estimate)
+
+
+def llm_stats() -> dict:
+    return {
+        "model": LLM_MODEL,
+        "base_url": LLM_BASE_URL,
+        "http2": _use_http2(),
+        **retry_stats,
+        **rate_budget.stats(),
+    }
@@ -0,0 +1,30 @@
+# llm/retry.py
+#
+# Retry policy shared by chat completions and embedding requests.
+
+import random
+import openai
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def retry_delay(attempt: int, error: Exception | None = None) -> float:
+    """Use the server's Retry-After when given, otherwise full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        headers = response.headers
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000 + random.uniform(0, 0.5)
+            if headers.get("retry-after"):
+                return float(headers["retry-after"]) + random.uniform(0, 0.5)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
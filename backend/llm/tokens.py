@@ -0,0 +1,26 @@
+# llm/tokens.py
+#
+# Token counts for request budgets, batch sizing and context packing.
+
+import logging
+import functools
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    # tiktoken downloads the BPE file on first use; offline without a cached copy, estimate instead
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, estimating token counts: %s", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
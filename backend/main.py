@@ -1,7 +1,10 @@
 # main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from api.routes import (
     embedder_api,
     retriever_api,
@@ -12,11 +15,32 @@ from api.routes import (
     docstring_api,
     summarizer_api
 )
+from retriever.retriever import warm_up, retriever_status
+from embedder.jobs import job_manager
+from llm.client import close_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the vector index once and warm it so the first search is not a cold start
+    try:
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        print(f"Retriever warm-up skipped: {e}")
+    # Pick up embedding jobs a previous process left unfinished
+    resumed = job_manager.resume_pending()
+    if resumed:
+        print(f"Resumed {len(resumed)} embedding job(s)")
+    app.state.started = True
+    yield
+    await asyncio.to_thread(job_manager.shutdown)
+    await close_client()
 
 app = FastAPI(
     title="AI Code Assistant",
     description="An intelligent assistant that analyzes, summarizes, visualizes, and interacts with codebases.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware for frontend access
@@ -40,4 +64,10 @@ app.include_router(summarizer_api.router, prefix="/summary", tags=["Summarizer"]
 
 @app.get("/")
 def root():
-    return {"message": "AI Code Assistant backend is running 🚀"}
\ No newline at end of file
+    return {"message": "AI Code Assistant backend is running 🚀"}
+
+@app.get("/ready")
+def ready():
+    # Ready once startup has finished; a server with nothing embedded yet can still accept uploads
+    started = getattr(app.state, "started", False)
+    return JSONResponse({"ready": started, **retriever_status()}, status_code=200 if started else 503)
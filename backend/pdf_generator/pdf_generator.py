@@ -10,8 +10,10 @@ from reportlab.platypus import (
 from reportlab.platypus.tableofcontents import TableOfContents
 from reportlab.lib import colors
 from datetime import datetime
+from xml.sax.saxutils import escape
 import os
 from summarizer.summary_generator import generate_summaries
+from summarizer.summary_model import CodebaseSummary, ChunkSummary, chunk_text, NO_FILES_MESSAGE
 DEFAULT_CODEBASE_PATH = "./sample-codebase"
 PDF_OUTPUT_PATH = "output/codebase_summary.pdf"
 class NumberedCanvas:
@@ -194,7 +196,7 @@ def create_title_page_content():
     
     return content
 
-def build_enhanced_toc(summaries: str):
+def build_enhanced_toc(summary: CodebaseSummary):
     """Build an enhanced table of contents with page references"""
     styles = create_enhanced_styles()
     content = []
@@ -203,25 +205,12 @@ def build_enhanced_toc(summaries: str):
     content.append(Paragraph("Table of Contents", styles["TOCHeading"]))
     content.append(Spacer(1, 0.3 * inch))
     
-    # Parse summaries to build TOC
-    toc_entries = []
-    current_section = None
-    
-    for line in summaries.splitlines():
-        if line.startswith("# "):
-            current_section = line[2:].strip()
-            toc_entries.append(("section", current_section))
-        elif line.startswith("### Summary for"):
-            file_name = line.replace("### Summary for", "").strip()
-            toc_entries.append(("file", file_name))
-    
     # Create TOC table
     toc_data = []
-    for entry_type, entry_text in toc_entries:
-        if entry_type == "section":
-            toc_data.append([entry_text, ""])  # Page numbers would be added by reportlab TOC
-        else:
-            toc_data.append([f"  • {entry_text}", ""])
+    if summary.title is not None:
+        toc_data.append([escape(summary.title), ""])  # Page numbers would be added by reportlab TOC
+    for file in summary.files:
+        toc_data.append([f"  • {escape(file.path)}", ""])
     
     if toc_data:
         toc_table = Table(toc_data, colWidths=[5*inch, 1*inch])
@@ -241,67 +230,42 @@ def build_enhanced_toc(summaries: str):
     content.append(PageBreak())
     return content
 
-def process_content_with_enhanced_formatting(summaries: str):
+def chunk_paragraphs(chunk: ChunkSummary, styles) -> list:
+    """A chunk summary as a bullet, continuation lines as body text or further bullets"""
+    paragraphs = []
+    lines = [line.strip() for line in chunk_text(chunk).splitlines()]
+    for n, line in enumerate(line for line in lines if line):
+        # Summaries are model output and may contain '<' or '&', which Paragraph treats as markup
+        if n == 0 or line.startswith("- "):
+            paragraphs.append(Paragraph(escape(line if line.startswith("- ") else f"- {line}"), styles["BulletPoint"]))
+        else:
+            paragraphs.append(Paragraph(escape(line), styles["EnhancedBody"]))
+        paragraphs.append(Spacer(1, 3))
+    return paragraphs
+
+def process_content_with_enhanced_formatting(summary: CodebaseSummary):
     """Process content with enhanced formatting and proper pagination"""
     styles = create_enhanced_styles()
     content = []
     
-    lines = summaries.splitlines()
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if not line:
-            content.append(Spacer(1, 6))
-            i += 1
-            continue
-        
-        if line.startswith("# "):
-            # Major section header
-            section_content = []
-            section_content.append(Paragraph(line[2:], styles["SectionHeader"]))
-            section_content.append(Spacer(1, 12))
-            content.append(KeepTogether(section_content))
-            
-        elif line.startswith("### Summary for"):
-            # File header - create a new section
-            file_name = line.replace("### Summary for", "").strip()
-            
-            # Group file header with its content
-            file_section = []
-            file_section.append(Spacer(1, 12))
-            file_section.append(Paragraph(f"File: {file_name}", styles["FileHeader"]))
-            
-            # Look ahead to collect file content
-            j = i + 1
-            file_content = []
-            while j < len(lines) and not lines[j].startswith("### Summary for") and not lines[j].startswith("# "):
-                content_line = lines[j].strip()
-                if content_line:
-                    if content_line.startswith("- "):
-                        file_content.append(Paragraph(content_line, styles["BulletPoint"]))
-                    else:
-                        file_content.append(Paragraph(content_line, styles["EnhancedBody"]))
-                    file_content.append(Spacer(1, 3))
-                j += 1
-            
-            file_section.extend(file_content)
-            file_section.append(Spacer(1, 12))
-            
-            # Keep file sections together when possible
-            content.append(KeepTogether(file_section))
-            i = j - 1  # Skip processed lines
-            
-        elif line.startswith("- "):
-            # Bullet point
-            content.append(Paragraph(line, styles["BulletPoint"]))
-            
-        else:
-            # Regular paragraph
-            content.append(Paragraph(line, styles["EnhancedBody"]))
+    if summary.title is not None:
+        # Major section header
+        section_content = []
+        section_content.append(Paragraph(escape(summary.title), styles["SectionHeader"]))
+        section_content.append(Spacer(1, 12))
+        content.append(KeepTogether(section_content))
+    
+    for file in summary.files:
+        # Group file header with its content
+        file_section = []
+        file_section.append(Spacer(1, 12))
+        file_section.append(Paragraph(f"File: {escape(file.path)}", styles["FileHeader"]))
+        for chunk in file.chunks:
+            file_section.extend(chunk_paragraphs(chunk, styles))
+        file_section.append(Spacer(1, 12))
         
-        i += 1
+        # Keep file sections together when possible
+        content.append(KeepTogether(file_section))
     
     return content
 
@@ -335,9 +299,9 @@ async def generate_pdf_from_codebase(codebase_path: str = DEFAULT_CODEBASE_PATH)
     """Generate enhanced PDF with professional formatting, pagination, and alignment"""
     
     # Generate summaries
-    summaries = await generate_summaries(codebase_path)
-    if not summaries.strip():
-        raise ValueError("No summaries generated.")
+    summary = await generate_summaries(codebase_path)
+    if not summary.files:
+        raise ValueError(NO_FILES_MESSAGE)
     
     # Create document with enhanced margins and settings
     doc = SimpleDocTemplate(
@@ -358,10 +322,10 @@ async def generate_pdf_from_codebase(codebase_path: str = DEFAULT_CODEBASE_PATH)
     content.extend(create_title_page_content())
     
     # 2. Table of contents
-    content.extend(build_enhanced_toc(summaries))
+    content.extend(build_enhanced_toc(summary))
     
     # 3. Main content with enhanced formatting
-    content.extend(process_content_with_enhanced_formatting(summaries))
+    content.extend(process_content_with_enhanced_formatting(summary))
     
     # Build PDF with custom page templates
     try:
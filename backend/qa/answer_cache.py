@@ -0,0 +1,212 @@
+# qa/answer_cache.py
+
+import os
+import time
+import threading
+import numpy as np
+from embedder.codebases import validate_codebase_id
+from retriever.retriever import question_embedding, chunks_exist
+
+QA_ANSWER_CACHE = os.getenv("QA_ANSWER_CACHE", "1") == "1"
+# Cosine similarity a new question needs to a cached one to reuse its answer
+QA_ANSWER_CACHE_THRESHOLD = float(os.getenv("QA_ANSWER_CACHE_THRESHOLD", "0.95"))
+QA_ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("QA_ANSWER_CACHE_MAX_ENTRIES", "2000"))
+QA_ANSWER_CACHE_TTL = float(os.getenv("QA_ANSWER_CACHE_TTL", "86400"))
+
+
+class _Scope:
+    """Cached questions of one (codebase, embedding model, top_k, context token budget) as a normalised matrix."""
+
+    def __init__(self, dim: int):
+        self.matrix = np.zeros((16, dim), dtype=np.float32)
+        self.entries = []
+
+    def add(self, vector: np.ndarray, entry: dict):
+        if len(self.entries) == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+        self.matrix[len(self.entries)] = vector
+        self.entries.append(entry)
+
+    def remove(self, rows: list[int]):
+        drop = set(rows)
+        keep = [i for i in range(len(self.entries)) if i not in drop]
+        matrix = np.zeros((max(16, len(keep) * 2), self.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(keep)] = self.matrix[keep]
+        self.matrix, self.entries = matrix, [self.entries[i] for i in keep]
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding. A lookup is one matrix-vector product
+    over the cached questions of the same codebase; a hit is only served while
+    the chunks the answer was built from are still in the index, so a re-embed
+    that touches them invalidates it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = QA_ANSWER_CACHE_THRESHOLD,
+        max_entries: int = QA_ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = QA_ANSWER_CACHE_TTL,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scope_key: tuple, embedding, index_version: str, still_indexed) -> tuple[dict, float] | None:
+        """
+        Best cached answer at or above the threshold as (payload, similarity).
+        `still_indexed(chunk_ids)` re-validates entries built on an older index
+        version; it reads the index, so it runs without the lock held.
+        """
+        vector = self._normalise(embedding)
+        now = time.time()
+        with self._lock:
+            scope = self._scopes.get(scope_key)
+            if scope is None or not scope.entries or scope.matrix.shape[1] != len(vector):
+                self.misses += 1
+                return None
+            similarities = scope.matrix[:len(scope.entries)] @ vector
+            candidates = [
+                (scope.entries[row], float(similarities[row]))
+                for row in np.argsort(-similarities)
+                if similarities[row] >= self.threshold
+            ]
+
+        hit, stale = None, []
+        for entry, similarity in candidates:
+            if now - entry["created_at"] > self.ttl_seconds:
+                stale.append(entry)
+                continue
+            # Chunk ids are content hashes: if they all survived the re-embed, so did the answer
+            if entry["index_version"] != index_version and not still_indexed(entry["chunk_ids"]):
+                stale.append(entry)
+                continue
+            hit = entry, similarity
+            break
+
+        with self._lock:
+            if stale:
+                self._drop(scope_key, stale)
+            if hit is None:
+                self.misses += 1
+                return None
+            entry, similarity = hit
+            entry["index_version"] = index_version
+            entry["last_used"] = now
+            self.hits += 1
+            return entry["payload"], similarity
+
+    def _drop(self, scope_key: tuple, entries: list[dict]):
+        # Rows may have moved while the lock was released, so entries are matched by identity
+        scope = self._scopes.get(scope_key)
+        if scope is None:
+            return
+        dropped = {id(entry) for entry in entries}
+        rows = [row for row, entry in enumerate(scope.entries) if id(entry) in dropped]
+        self.invalidated += len(rows)
+        scope.remove(rows)
+
+    def store(self, scope_key: tuple, embedding, index_version: str, chunk_ids: list[str], question: str, payload: dict):
+        vector = self._normalise(embedding)
+        now = time.time()
+        entry = {
+            "question": question,
+            "payload": payload,
+            "index_version": index_version,
+            "chunk_ids": list(chunk_ids),
+            "created_at": now,
+            "last_used": now,
+        }
+        with self._lock:
+            scope = self._scopes.get(scope_key)
+            if scope is None or scope.matrix.shape[1] != len(vector):
+                scope = self._scopes[scope_key] = _Scope(len(vector))
+            scope.add(vector, entry)
+            self._evict()
+
+    def _evict(self):
+        total = sum(len(scope.entries) for scope in self._scopes.values())
+        if total <= self.max_entries:
+            return
+        # Least recently used first, across all scopes
+        ranked = sorted(
+            ((entry["last_used"], key, row) for key, scope in self._scopes.items() for row, entry in enumerate(scope.entries)),
+        )
+        victims = {}
+        for _, key, row in ranked[:total - self.max_entries]:
+            victims.setdefault(key, []).append(row)
+        for key, rows in victims.items():
+            self._scopes[key].remove(rows)
+            if not self._scopes[key].entries:
+                del self._scopes[key]
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(scope.entries) for scope in self._scopes.values()),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+answer_cache = SemanticAnswerCache()
+
+
+def _scope_key(codebase_id: str, handle: dict, top_k: int, token_budget: int) -> tuple:
+    # A larger budget packs more context, so its answers are not interchangeable
+    return (codebase_id, handle["provider"].model, top_k, token_budget)
+
+
+def lookup_answer(question: str, codebase_id: str | None, top_k: int, token_budget: int) -> dict | None:
+    """A cached answer to this or a near-identical question, marked `cached`, else None."""
+    if not QA_ANSWER_CACHE:
+        return None
+    codebase_id = validate_codebase_id(codebase_id)
+    embedding, handle = question_embedding(question, codebase_id)
+    if embedding is None:
+        # Retrieval answers symbol lookups without embedding them, so the semantic cache does not cover them
+        return None
+    hit = answer_cache.lookup(
+        _scope_key(codebase_id, handle, top_k, token_budget),
+        embedding,
+        handle["version"],
+        lambda ids: chunks_exist(handle, ids),
+    )
+    if hit is None:
+        return None
+    payload, similarity = hit
+    return {**payload, "cached": True, "cache_similarity": round(similarity, 4)}
+
+
+def remember_answer(question: str, codebase_id: str | None, top_k: int, token_budget: int, payload: dict):
+    """Cache an answer payload; its `sources` name the chunks it depends on."""
+    if not QA_ANSWER_CACHE:
+        return
+    codebase_id = validate_codebase_id(codebase_id)
+    # Served from the query-embedding cache, since retrieval just embedded the same question
+    embedding, handle = question_embedding(question, codebase_id)
+    if embedding is None:
+        return
+    chunk_ids = [cid for source in payload.get("sources", []) for cid in source.get("chunk_ids", [])]
+    answer_cache.store(_scope_key(codebase_id, handle, top_k, token_budget), embedding, handle["version"], chunk_ids, question, payload)
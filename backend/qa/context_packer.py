@@ -0,0 +1,208 @@
+# qa/context_packer.py
+
+import os
+import hashlib
+from dataclasses import dataclass, field
+from llm.tokens import count_tokens
+from retriever.lexical_index import tokenize
+
+QA_CONTEXT_TOKEN_BUDGET = int(os.getenv("QA_CONTEXT_TOKEN_BUDGET", "3000"))
+# Balance between retrieval rank and novelty when picking the next block
+QA_MMR_LAMBDA = float(os.getenv("QA_MMR_LAMBDA", "0.7"))
+# Blocks this similar to an already chosen block add nothing and are dropped
+QA_DUPLICATE_THRESHOLD = float(os.getenv("QA_DUPLICATE_THRESHOLD", "0.85"))
+
+
+@dataclass(slots=True)
+class ContextBlock:
+    source: str
+    start_line: int | None
+    end_line: int | None
+    text: str
+    rank: int
+    symbols: list[str] = field(default_factory=list)
+    chunk_ids: list[str] = field(default_factory=list)
+    tokens: int = 0
+
+    def header(self) -> str:
+        if self.start_line is None:
+            return f"# {self.source}"
+        return f"# {self.source}:{self.start_line}-{self.end_line}"
+
+    def render(self) -> str:
+        return f"{self.header()}\n{self.text}"
+
+    def block_id(self) -> str:
+        """Content hash, equal for identical blocks packed for different questions."""
+        return hashlib.sha1(self.render().encode("utf-8")).hexdigest()[:16]
+
+    def reference(self) -> dict:
+        return {
+            "block_id": self.block_id(),
+            "source": self.source,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+            "symbols": self.symbols,
+            "chunk_ids": self.chunk_ids,
+        }
+
+
+@dataclass(slots=True)
+class PackedContext:
+    text: str
+    blocks: list[ContextBlock]
+    tokens: int
+    budget: int
+    candidates: int
+    merged: int = 0
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+
+    def sources(self) -> list[dict]:
+        return [block.reference() for block in self.blocks]
+
+    def stats(self) -> dict:
+        return {
+            "context_tokens": self.tokens,
+            "token_budget": self.budget,
+            "chunks_retrieved": self.candidates,
+            "blocks_used": len(self.blocks),
+            "chunks_merged": self.merged,
+            "duplicates_dropped": self.duplicates_dropped,
+            "over_budget_dropped": self.over_budget_dropped,
+        }
+
+
+def _line_range(metadata: dict) -> tuple[int | None, int | None]:
+    try:
+        return int(metadata["start_line"]), int(metadata["end_line"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+
+def merge_chunks(documents) -> tuple[list[ContextBlock], int]:
+    """
+    Turn ranked documents into blocks, merging chunks of the same file whose
+    line ranges overlap or touch. Returns (blocks, number of chunks merged away).
+    """
+    by_source, blocks = {}, []
+    for rank, doc in enumerate(documents):
+        metadata = doc.metadata or {}
+        start, end = _line_range(metadata)
+        block = ContextBlock(
+            source=metadata.get("source", "unknown"),
+            start_line=start,
+            end_line=end,
+            text=doc.page_content,
+            rank=rank,
+            symbols=[s for s in metadata.get("symbols", "").split(",") if s],
+            chunk_ids=[metadata["chunk_id"]] if metadata.get("chunk_id") else [],
+        )
+        if start is None:
+            # No line information (e.g. an index built by an older embedder): keep as is
+            blocks.append(block)
+        else:
+            by_source.setdefault(block.source, []).append(block)
+
+    merged_away = 0
+    for source_blocks in by_source.values():
+        source_blocks.sort(key=lambda b: (b.start_line, b.end_line))
+        current = source_blocks[0]
+        lines = _numbered_lines(current)
+        for block in source_blocks[1:]:
+            if block.start_line <= current.end_line + 1:
+                lines.update({n: line for n, line in _numbered_lines(block).items() if n not in lines})
+                current.end_line = max(current.end_line, block.end_line)
+                current.rank = min(current.rank, block.rank)
+                current.symbols += [s for s in block.symbols if s not in current.symbols]
+                current.chunk_ids += block.chunk_ids
+                merged_away += 1
+                continue
+            current.text = "\n".join(lines[n] for n in sorted(lines))
+            blocks.append(current)
+            current, lines = block, _numbered_lines(block)
+        current.text = "\n".join(lines[n] for n in sorted(lines))
+        blocks.append(current)
+    return blocks, merged_away
+
+
+def _numbered_lines(block: ContextBlock) -> dict[int, str]:
+    return {block.start_line + i: line for i, line in enumerate(block.text.split("\n"))}
+
+
+def _similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _truncate_to_budget(block: ContextBlock, budget: int) -> ContextBlock | None:
+    """Keep the leading lines of a block that alone exceeds the budget."""
+    header_tokens = count_tokens(block.header() + "\n")
+    kept, used = [], header_tokens
+    for line in block.text.split("\n"):
+        line_tokens = count_tokens(line + "\n")
+        if used + line_tokens > budget:
+            break
+        kept.append(line)
+        used += line_tokens
+    if not kept:
+        return None
+    block.text = "\n".join(kept)
+    if block.start_line is not None:
+        block.end_line = block.start_line + len(kept) - 1
+    block.tokens = used
+    return block
+
+
+def pack_context(documents, token_budget: int = QA_CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Assemble retrieved documents (best first) into one prompt context: merge
+    neighbouring chunks of a file, pick blocks by maximal marginal relevance,
+    drop near-duplicates, stop at `token_budget` tokens and order the result
+    by file and line.
+    """
+    documents = list(documents)
+    blocks, merged = merge_chunks(documents)
+    for block in blocks:
+        block.tokens = count_tokens(block.render() + "\n\n")
+    terms = {id(block): set(tokenize(block.text)) for block in blocks}
+
+    selected, duplicates, over_budget = [], 0, 0
+    remaining = sorted(blocks, key=lambda b: b.rank)
+    used = 0
+    while remaining:
+        best, best_score, best_overlap = None, None, 0.0
+        for block in remaining:
+            relevance = 1.0 / (1 + block.rank)
+            overlap = max((_similarity(terms[id(block)], terms[id(s)]) for s in selected), default=0.0)
+            score = QA_MMR_LAMBDA * relevance - (1 - QA_MMR_LAMBDA) * overlap
+            if best_score is None or score > best_score:
+                best, best_score, best_overlap = block, score, overlap
+        remaining.remove(best)
+        if best_overlap >= QA_DUPLICATE_THRESHOLD:
+            duplicates += 1
+            continue
+        if used + best.tokens > token_budget:
+            # The top block alone may not fit; its first lines beat an empty context
+            if not selected and _truncate_to_budget(best, token_budget) is not None:
+                selected.append(best)
+                used += best.tokens
+            else:
+                over_budget += 1
+            continue
+        selected.append(best)
+        used += best.tokens
+
+    selected.sort(key=lambda b: (b.source, b.start_line or 0))
+    text = "\n\n".join(block.render() for block in selected)
+    return PackedContext(
+        text=text,
+        blocks=selected,
+        tokens=count_tokens(text) if text else 0,
+        budget=token_budget,
+        candidates=len(documents),
+        merged=merged,
+        duplicates_dropped=duplicates,
+        over_budget_dropped=over_budget,
+    )
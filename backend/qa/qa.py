@@ -1,29 +1,233 @@
 # qa/qa.py
 
 import os
-from openai import OpenAI
-from retriever.retriever import retrieve_code_chunks
+import asyncio
+from llm.client import chat, chat_stream, LLM_MODEL
+from retriever.retriever import retrieve_code_documents, embed_queries
+from qa.context_packer import pack_context, QA_CONTEXT_TOKEN_BUDGET
+from qa.answer_cache import lookup_answer, remember_answer
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+QA_MODEL = os.getenv("QA_MODEL", LLM_MODEL)
+QA_TEMPERATURE = float(os.getenv("QA_TEMPERATURE", "0.3"))
+QA_RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("QA_RETRIEVAL_TIMEOUT_SECONDS", "20"))
+# Whole completion for /qa/ask, retries included; for streams it applies between chunks
+QA_LLM_TIMEOUT_SECONDS = float(os.getenv("QA_LLM_TIMEOUT_SECONDS", "90"))
+NO_CONTEXT_ANSWER = "No relevant code found to answer the question."
+# Completions in flight for one /qa/batch request
+QA_BATCH_CONCURRENCY = int(os.getenv("QA_BATCH_CONCURRENCY", "8"))
 
 SYSTEM_PROMPT = """You are a senior software engineer. Use the provided context from a codebase to answer user questions clearly and accurately."""
 
-def build_prompt(context_chunks: list[str], question: str) -> list[dict]:
-    context_text = "\n\n".join(context_chunks)
+def build_prompt(context_text: str, question: str) -> list[dict]:
     return [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": f"Context:\n{context_text}\n\nQuestion: {question}"},
     ]
 
-def answer_question(question: str, k: int = 5) -> str:
-    chunks = retrieve_code_chunks(question, k=k)
-    if not chunks:
-        return "No relevant code found to answer the question."
 
-    messages = build_prompt(chunks, question)
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=messages
+def _cached_or_context(question: str, top_k: int, codebase_id: str | None, token_budget: int, packed=None):
+    cached = lookup_answer(question, codebase_id, top_k, token_budget)
+    if cached is not None:
+        return cached, None
+    documents = retrieve_code_documents(question, top_k=top_k, codebase_id=codebase_id)
+    if packed is None:
+        return None, pack_context(documents, token_budget)
+    # Questions that retrieved the same chunks share one packed context, and so one prompt prefix
+    key = tuple(doc.metadata.get("chunk_id") for doc in documents)
+    context = packed.get(key)
+    if context is None:
+        context = packed[key] = pack_context(documents, token_budget)
+    return None, context
+
+
+async def prepare(question: str, top_k: int, codebase_id: str | None, token_budget: int, packed=None):
+    """(cached answer, None) or (None, packed context), computed off the event loop."""
+    return await asyncio.wait_for(
+        asyncio.to_thread(_cached_or_context, question, top_k, codebase_id, token_budget, packed),
+        QA_RETRIEVAL_TIMEOUT_SECONDS,
+    )
+
+
+def _no_context(context) -> dict:
+    return {"answer": NO_CONTEXT_ANSWER, **context.stats(), "sources": [], "cached": False}
+
+
+async def answer_question(
+    question: str,
+    top_k: int = 5,
+    codebase_id: str | None = None,
+    token_budget: int = QA_CONTEXT_TOKEN_BUDGET,
+) -> dict:
+    """Answer a question from packed code context; the result reports the tokens used."""
+    cached, context = await prepare(question, top_k, codebase_id, token_budget)
+    if cached is not None:
+        return cached
+    return await _complete(question, top_k, codebase_id, token_budget, context)
+
+
+async def _complete(question: str, top_k: int, codebase_id: str | None, token_budget: int, context) -> dict:
+    if not context.blocks:
+        return _no_context(context)
+    response = await asyncio.wait_for(
+        chat(
+            build_prompt(context.text, question),
+            QA_MODEL,
+            temperature=QA_TEMPERATURE,
+            timeout=QA_LLM_TIMEOUT_SECONDS,
+        ),
+        QA_LLM_TIMEOUT_SECONDS,
     )
-    return response.choices[0].message.content.strip()
+    usage = response.usage
+    payload = {
+        "answer": response.choices[0].message.content.strip(),
+        **context.stats(),
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "completion_tokens": usage.completion_tokens if usage else None,
+        "sources": context.sources(),
+    }
+    await asyncio.to_thread(remember_answer, question, codebase_id, top_k, token_budget, payload)
+    return {**payload, "cached": False}
+
+
+async def stream_answer(
+    question: str,
+    top_k: int = 5,
+    codebase_id: str | None = None,
+    token_budget: int = QA_CONTEXT_TOKEN_BUDGET,
+    is_disconnected=None,
+):
+    """
+    Yield ("sources", data), then ("token", data) per delta, then ("done", data).
+    Stops, closing the upstream stream, once `await is_disconnected()` is true.
+    """
+    cached, context = await prepare(question, top_k, codebase_id, token_budget)
+    if cached is not None:
+        answer = cached.pop("answer")
+        yield "sources", cached
+        yield "token", {"text": answer}
+        yield "done", {"context_tokens": cached.get("context_tokens"), "cached": True}
+        return
+    yield "sources", {"sources": context.sources(), **context.stats()}
+    if not context.blocks:
+        yield "token", {"text": NO_CONTEXT_ANSWER}
+        yield "done", {"context_tokens": context.tokens, "cached": False}
+        return
+
+    stream = await chat_stream(
+        build_prompt(context.text, question),
+        QA_MODEL,
+        temperature=QA_TEMPERATURE,
+        stream_options={"include_usage": True},
+        timeout=QA_LLM_TIMEOUT_SECONDS,
+    )
+    answer, usage = [], None
+    try:
+        async for chunk in stream:
+            if is_disconnected is not None and await is_disconnected():
+                return
+            usage = chunk.usage or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                answer.append(delta)
+                yield "token", {"text": delta}
+    finally:
+        # Dropping the upstream response stops generation we would otherwise pay for
+        await stream.close()
+
+    payload = {
+        "answer": "".join(answer).strip(),
+        **context.stats(),
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "completion_tokens": usage.completion_tokens if usage else None,
+        "sources": context.sources(),
+    }
+    # Only complete answers are worth reusing
+    await asyncio.to_thread(remember_answer, question, codebase_id, top_k, token_budget, payload)
+    yield "done", {
+        "context_tokens": context.tokens,
+        "prompt_tokens": payload["prompt_tokens"],
+        "completion_tokens": payload["completion_tokens"],
+        "cached": False,
+    }
+
+
+async def answer_batch(
+    questions: list[str],
+    top_k: int = 5,
+    codebase_id: str | None = None,
+    token_budget: int = QA_CONTEXT_TOKEN_BUDGET,
+    concurrency: int = QA_BATCH_CONCURRENCY,
+):
+    """
+    Answer many questions against one codebase. Query embeddings are computed
+    in one call, retrievals run together and completions run `concurrency` at
+    a time. Yields ("block", data) the first time a context block is used,
+    ("answer", data) as each question finishes (in completion order, with its
+    `index`), then ("done", data). Closing the generator cancels pending work.
+    """
+    started = asyncio.get_running_loop().time()
+    await asyncio.wait_for(asyncio.to_thread(embed_queries, questions, codebase_id), QA_RETRIEVAL_TIMEOUT_SECONDS)
+
+    packed = {}
+    prepared = await asyncio.gather(
+        *(prepare(question, top_k, codebase_id, token_budget, packed) for question in questions),
+        return_exceptions=True,
+    )
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    # Repeats of a question within the batch share one completion
+    completions = {}
+
+    async def complete(question: str, context):
+        async with semaphore:
+            return await _complete(question, top_k, codebase_id, token_budget, context)
+
+    async def run(index: int, question: str, prepared_result):
+        """(index, result, context, error); a failed question never aborts the batch."""
+        try:
+            if isinstance(prepared_result, BaseException):
+                raise prepared_result
+            cached, context = prepared_result
+            if cached is not None:
+                return index, cached, None, None
+            if question not in completions:
+                completions[question] = asyncio.ensure_future(complete(question, context))
+            return index, await asyncio.shield(completions[question]), context, None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return index, None, None, e
+
+    tasks = [
+        asyncio.ensure_future(run(index, question, result))
+        for index, (question, result) in enumerate(zip(questions, prepared))
+    ]
+    sent_blocks, counts = set(), {"answered": 0, "cached": 0, "failed": 0}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result, context, error = await next_done
+            if error is not None:
+                counts["failed"] += 1
+                yield "answer", {"index": index, "question": questions[index], "error": str(error) or type(error).__name__}
+                continue
+            counts["answered"] += 1
+            if context is None:
+                counts["cached"] += bool(result.get("cached"))
+            else:
+                # Send each block's text once; answers refer to blocks by id
+                for block in context.blocks:
+                    block_id = block.block_id()
+                    if block_id not in sent_blocks:
+                        sent_blocks.add(block_id)
+                        yield "block", {**block.reference(), "text": block.text}
+            yield "answer", {"index": index, "question": questions[index], **result}
+    finally:
+        for task in [*tasks, *completions.values()]:
+            task.cancel()
+
+    yield "done", {
+        "questions": len(questions),
+        **counts,
+        "distinct_contexts": len(packed),
+        "distinct_blocks": len(sent_blocks),
+        "seconds": round(asyncio.get_running_loop().time() - started, 3),
+    }
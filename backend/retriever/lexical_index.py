@@ -0,0 +1,166 @@
+# retriever/lexical_index.py
+
+import os
+import re
+import json
+import math
+import heapq
+from collections import Counter
+
+LEXICAL_INDEX_FILE = "lexical_index.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+STOP_WORDS = {
+    "a", "an", "and", "as", "at", "be", "by", "def", "do", "does", "for", "from", "how", "if", "in",
+    "is", "it", "of", "on", "or", "return", "self", "the", "this", "to", "what", "where", "which", "with",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased identifiers plus their snake_case and camelCase parts."""
+    tokens = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        lowered = identifier.lower()
+        if lowered not in STOP_WORDS:
+            tokens.append(lowered)
+        parts = [p.lower() for piece in identifier.split("_") for p in CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if len(p) > 1 and p not in STOP_WORDS)
+    return tokens
+
+
+def symbol_keys(symbol: str) -> set[str]:
+    """'Bank.transfer' is findable as 'bank.transfer' and as 'transfer'."""
+    lowered = symbol.lower()
+    return {lowered, lowered.rsplit(".", 1)[-1]}
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunk identifiers plus an exact symbol table, keyed by chunk id."""
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+        self.symbols = {}
+        self.total_length = 0
+
+    def add(self, chunk_id: str, text: str, symbols: list[str]):
+        if chunk_id in self.docs:
+            self.remove(chunk_id)
+        tf = Counter(tokenize(text))
+        symbols = [s for s in symbols if s]
+        self.docs[chunk_id] = {"tf": dict(tf), "length": sum(tf.values()), "symbols": symbols}
+        self._link(chunk_id)
+
+    def _link(self, chunk_id: str):
+        doc = self.docs[chunk_id]
+        self.total_length += doc["length"]
+        for term, count in doc["tf"].items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+        for symbol in doc["symbols"]:
+            for key in symbol_keys(symbol):
+                self.symbols.setdefault(key, []).append(chunk_id)
+
+    def remove(self, chunk_id: str):
+        doc = self.docs.pop(chunk_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc["length"]
+        for term in doc["tf"]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+        for symbol in doc["symbols"]:
+            for key in symbol_keys(symbol):
+                ids = self.symbols.get(key)
+                if ids and chunk_id in ids:
+                    ids.remove(chunk_id)
+                    if not ids:
+                        del self.symbols[key]
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """Top-k (chunk_id, bm25 score) pairs for a free-text query."""
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[chunk_id]["length"] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def lookup_symbol(self, name: str) -> list[str]:
+        """Chunk ids defining `name`, full dotted matches before bare-name matches."""
+        lowered = name.lower()
+        exact = list(self.symbols.get(lowered, []))
+        if "." in lowered:
+            return exact
+        return sorted(exact, key=lambda cid: lowered not in {s.lower() for s in self.docs[cid]["symbols"]})
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"docs": self.docs}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                docs = json.load(f).get("docs", {})
+        except (OSError, ValueError):
+            return index
+        index.docs = docs
+        for chunk_id in docs:
+            index._link(chunk_id)
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Fuse ranked id lists; ids ranked high in several lists float to the top."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda cid: scores[cid], reverse=True)
+
+
+IDENTIFIER_QUERY_RE = re.compile(
+    r"^\s*(?:where\s+is|where's|find|locate|show(?:\s+me)?|definition\s+of|define)?\s*"
+    r"(?:the\s+)?(?:function|method|class)?\s*`?([A-Za-z_][\w.]*)`?\s*(?:\(\))?\s*"
+    r"(?:defined|declared|implemented)?\s*\??\s*$",
+    re.IGNORECASE,
+)
+BACKTICK_RE = re.compile(r"`([A-Za-z_][\w.]*)(?:\(\))?`")
+
+
+def identifier_query(query: str) -> list[str]:
+    """Identifiers a query is asking about when it is purely a symbol lookup, else []."""
+    match = IDENTIFIER_QUERY_RE.match(query)
+    if match and match.group(1).lower() not in STOP_WORDS:
+        return [match.group(1)]
+    stripped = BACKTICK_RE.sub("", query)
+    identifiers = BACKTICK_RE.findall(query)
+    # "where is `a` or `b` defined" - nothing but lookup words besides the identifiers
+    if identifiers and all(word.lower() in STOP_WORDS | {"or", "defined", "declared", "implemented", "find", "locate"}
+                           for word in re.findall(r"[A-Za-z']+", stripped)):
+        return identifiers
+    return []
@@ -1,23 +1,218 @@
 # retriever/retriever.py
 
 import os
-from langchain.vectorstores import Chroma
-from langchain.embeddings import OpenAIEmbeddings
+import json
+import time
+import logging
+import threading
+from embedder.embedding_cache import CachedEmbeddings
+from embedder.providers import codebase_provider
+from embedder.index_version import read_index_version
+from embedder.codebases import (
+    validate_codebase_id,
+    codebase_state_dir,
+    get_codebase,
+    list_codebases,
+    touch_codebase,
+)
+from retriever.query_cache import TTLCache
+from retriever.lexical_index import LexicalIndex, LEXICAL_INDEX_FILE, identifier_query, reciprocal_rank_fusion
+from retriever.vector_backends import open_vector_backend
 
-CHROMA_PATH = "chroma_db"
-EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+WARM_UP_QUERY = "def main"
+WARM_UP_MAX_CODEBASES = int(os.getenv("WARM_UP_MAX_CODEBASES", "3"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+# Each ranker contributes this many candidates per requested result before fusion
+HYBRID_CANDIDATE_MULTIPLIER = 3
+RRF_K = 60
 
-# Load embedding model
-embedding_function = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
+logger = logging.getLogger(__name__)
 
-# Load vectorstore from disk
-def get_vectorstore():
-    if not os.path.exists(CHROMA_PATH):
-        raise FileNotFoundError(f"Chroma DB not found at: {CHROMA_PATH}. Run embedder first.")
-    return Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+# Process-wide vector backend handles per codebase, reopened only when the embedder publishes a new index version
+_handles = {}
+_handles_lock = threading.Lock()
+# `warm` is True once some index has answered a query; readiness itself is decided by the app
+_status = {"warm": False, "warmed": [], "warmed_at": None, "warm_up_ms": None, "errors": {}}
+
+# (model, dimensions, query text) -> embedding, and (codebase, query, top_k, filters, index version) -> documents
+query_embedding_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+retrieval_cache = TTLCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+def get_index(codebase_id: str | None = None) -> dict:
+    """Return the {backend, provider, embeddings, lexical_index, version} handle for a codebase."""
+    codebase_id = validate_codebase_id(codebase_id)
+    state_dir = codebase_state_dir(codebase_id)
+    version = read_index_version(state_dir)
+    with _handles_lock:
+        if version is None:
+            # Never embedded, or dropped since we opened it
+            _handles.pop(codebase_id, None)
+            raise FileNotFoundError(f"No index found for codebase '{codebase_id}'. Run embedder first.")
+        handle = _handles.get(codebase_id)
+        if handle is None or handle["version"] != version:
+            entry = get_codebase(codebase_id)
+            provider = codebase_provider(entry)
+            # Share the embedder's disk cache for repeated queries when the provider is worth caching
+            embeddings = CachedEmbeddings(provider, provider.model) if provider.cacheable else provider
+            handle = {
+                "backend": open_vector_backend(codebase_id, (entry or {}).get("vector_backend"), embeddings),
+                "provider": provider,
+                "embeddings": embeddings,
+                "lexical_index": LexicalIndex.load(os.path.join(state_dir, LEXICAL_INDEX_FILE)),
+                "version": version,
+            }
+            _handles[codebase_id] = handle
+    return handle
+
+def warm_up(codebase_ids: list[str] | None = None):
+    """
+    Open the most recently used indexes and run a throwaway query so first
+    searches are not cold. A codebase that fails is reported and skipped.
+    """
+    started = time.perf_counter()
+    if codebase_ids is None:
+        recent = sorted(list_codebases(), key=lambda entry: entry.get("last_used", 0), reverse=True)
+        codebase_ids = [entry["codebase_id"] for entry in recent[:WARM_UP_MAX_CODEBASES]]
+    warmed, errors = [], {}
+    for codebase_id in codebase_ids:
+        try:
+            handle = get_index(codebase_id)
+            handle["backend"].query(embed_query(handle, WARM_UP_QUERY), k=1)
+            warmed.append(codebase_id)
+        except Exception as e:
+            logger.warning("Retriever warm-up failed for codebase '%s': %s", codebase_id, e)
+            errors[codebase_id] = str(e)
+    _status.update(
+        warm=bool(warmed) or _status["warm"],
+        warmed=warmed,
+        warmed_at=time.time(),
+        warm_up_ms=round((time.perf_counter() - started) * 1000, 1),
+        errors=errors,
+    )
+
+def loaded_index_versions() -> dict:
+    with _handles_lock:
+        return {codebase_id: handle["version"] for codebase_id, handle in _handles.items()}
+
+def retriever_status() -> dict:
+    return {**_status, "index_versions": loaded_index_versions()}
+
+def retrieval_cache_stats() -> dict:
+    return {
+        "index_versions": loaded_index_versions(),
+        "query_embeddings": query_embedding_cache.stats(),
+        "results": retrieval_cache.stats(),
+    }
+
+def embed_query(handle: dict, query: str) -> list[float]:
+    provider = handle["provider"]
+    key = (provider.model, provider.dimensions, query)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = handle["embeddings"].embed_query(query)
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+def symbol_lookup(handle: dict, query: str) -> list[str]:
+    """
+    Chunk ids defining the identifiers a pure symbol-lookup query names, in
+    lookup order; [] when the query needs the vector index.
+    """
+    lexical_index = handle["lexical_index"]
+    if not (HYBRID_RETRIEVAL and len(lexical_index)):
+        return []
+    return list(dict.fromkeys(cid for name in identifier_query(query) for cid in lexical_index.lookup_symbol(name)))
+
+def embed_queries(queries: list[str], codebase_id: str | None = None) -> list[list[float] | None]:
+    """
+    Embed many queries with one provider call, filling the query-embedding
+    cache for later searches. Symbol lookups never need an embedding and get None.
+    """
+    handle = get_index(codebase_id)
+    provider = handle["provider"]
+    embeddings = [query_embedding_cache.get((provider.model, provider.dimensions, query)) for query in queries]
+    skipped = {query for query in set(queries) if symbol_lookup(handle, query)}
+    missing = list(dict.fromkeys(
+        query for query, embedding in zip(queries, embeddings) if embedding is None and query not in skipped
+    ))
+    if missing:
+        fresh = dict(zip(missing, handle["embeddings"].embed_documents(missing)))
+        for query, embedding in fresh.items():
+            query_embedding_cache.set((provider.model, provider.dimensions, query), embedding)
+        embeddings = [embedding if embedding is not None else fresh.get(query) for query, embedding in zip(queries, embeddings)]
+    return embeddings
+
+def question_embedding(query: str, codebase_id: str | None = None) -> tuple[list[float] | None, dict]:
+    """
+    A query's embedding in a codebase's vector space, with the handle it was
+    computed for. The embedding is None for symbol lookups, which retrieval answers without one.
+    """
+    handle = get_index(codebase_id)
+    if symbol_lookup(handle, query):
+        return None, handle
+    return embed_query(handle, query), handle
+
+def chunks_exist(handle: dict, chunk_ids: list[str]) -> bool:
+    """Whether every chunk id is still part of the handle's index."""
+    lexical_index = handle["lexical_index"]
+    if len(lexical_index):
+        return all(cid in lexical_index.docs for cid in chunk_ids)
+    return len(handle["backend"].get(list(set(chunk_ids)))) == len(set(chunk_ids))
+
+def vector_search(handle: dict, query: str, k: int, filters: dict | None = None):
+    """Nearest chunks to the query embedding as (chunk_id, Document) pairs."""
+    return handle["backend"].query(embed_query(handle, query), k, filters)
+
+def hybrid_search(handle: dict, query: str, top_k: int, filters: dict | None = None):
+    """
+    Fuse BM25 and vector rankings with reciprocal-rank fusion. Queries that only
+    name identifiers found in the symbol table are answered without embedding,
+    unless the filters leave fewer than top_k symbol hits; the vector ranking
+    then fills the rest.
+    """
+    backend, lexical_index = handle["backend"], handle["lexical_index"]
+    candidates = top_k * HYBRID_CANDIDATE_MULTIPLIER
+    lexical_ranking = [cid for cid, _ in lexical_index.search(query, candidates)]
+    symbol_ranking = symbol_lookup(handle, query)
+
+    documents, results = {}, []
+    if symbol_ranking:
+        ranked = reciprocal_rank_fusion([symbol_ranking, lexical_ranking], k=RRF_K)[:candidates]
+        documents = backend.get(ranked, filters)
+        results = [cid for cid in ranked if cid in documents][:top_k]
+        if len(results) == top_k:
+            return [documents[cid] for cid in results]
+    vector_hits = vector_search(handle, query, candidates, filters)
+    ranked = reciprocal_rank_fusion([[cid for cid, _ in vector_hits], lexical_ranking], k=RRF_K)
+    documents.update(vector_hits)
+    documents.update(backend.get([cid for cid in ranked if cid not in documents], filters))
+    results += [cid for cid in ranked if cid in documents and cid not in results]
+    return [documents[cid] for cid in results[:top_k]]
+
+def retrieve_code_documents(query: str, top_k: int = 5, filters: dict | None = None, codebase_id: str | None = None):
+    codebase_id = validate_codebase_id(codebase_id)
+    handle = get_index(codebase_id)
+    # The index version is part of the key, so results from an older index are never served
+    key = (codebase_id, query, top_k, json.dumps(filters, sort_keys=True) if filters else None, handle["version"])
+    results = retrieval_cache.get(key)
+    if results is None:
+        if HYBRID_RETRIEVAL and len(handle["lexical_index"]):
+            results = hybrid_search(handle, query, top_k, filters)
+        else:
+            results = [doc for _, doc in vector_search(handle, query, top_k, filters)]
+        retrieval_cache.set(key, results)
+    touch_codebase(codebase_id)
+    # A successful search proves an index is usable even if startup warm-up failed
+    _status["warm"] = True
+    return results
 
 # Retrieve top-k relevant code chunks
-def retrieve_code_chunks(query: str, top_k: int = 5):
-    vectorstore = get_vectorstore()
-    results = vectorstore.similarity_search(query, k=top_k)
-    return [doc.page_content for doc in results]
+def retrieve_code_chunks(query: str, top_k: int = 5, filters: dict | None = None, codebase_id: str | None = None):
+    return [
+        doc.page_content
+        for doc in retrieve_code_documents(query, top_k=top_k, filters=filters, codebase_id=codebase_id)
+    ]
@@ -0,0 +1,540 @@
+# retriever/vector_backends.py
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from langchain.vectorstores import Chroma
+from langchain.schema import Document
+from embedder.codebases import CHROMA_PATH, collection_name, codebase_state_dir
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+NUMPY_VECTOR_DTYPE = os.getenv("NUMPY_VECTOR_DTYPE", "float16")
+NUMPY_QUERY_BLOCK_ROWS = 65536
+# Rewrite the files once this share of rows has been deleted or superseded
+NUMPY_COMPACTION_RATIO = 0.3
+
+
+def to_documents(ids, texts, metadatas):
+    return [
+        (cid, Document(page_content=text, metadata={**(metadata or {}), "chunk_id": cid}))
+        for cid, text, metadata in zip(ids, texts, metadatas)
+    ]
+
+
+class VectorBackend:
+    """Storage for one codebase's chunk vectors. Embeddings are supplied by the caller."""
+
+    name = "base"
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def query(self, embedding, k: int, filters: dict | None = None):
+        """Top-k (chunk_id, Document) pairs by similarity to `embedding`."""
+        return self.query_many([embedding], k, filters)[0]
+
+    def query_many(self, embeddings, k: int, filters: dict | None = None):
+        raise NotImplementedError
+
+    def get(self, ids, filters: dict | None = None) -> dict:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def persist(self):
+        pass
+
+    def drop(self):
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, codebase_id: str, embedding_function=None, persist_directory: str = CHROMA_PATH):
+        self.store = Chroma(
+            collection_name=collection_name(codebase_id),
+            persist_directory=persist_directory,
+            embedding_function=embedding_function,
+        )
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.store._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        if ids:
+            self.store.delete(ids=ids)
+
+    def query_many(self, embeddings, k: int, filters: dict | None = None):
+        result = self.store._collection.query(
+            query_embeddings=[list(map(float, e)) for e in embeddings],
+            n_results=k,
+            where=filters or None,
+            include=["documents", "metadatas"],
+        )
+        return [
+            to_documents(ids, texts, metadatas)
+            for ids, texts, metadatas in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+
+    def get(self, ids, filters: dict | None = None) -> dict:
+        if not ids:
+            return {}
+        result = self.store._collection.get(ids=ids, where=filters or None, include=["documents", "metadatas"])
+        return dict(to_documents(result["ids"], result["documents"], result["metadatas"]))
+
+    def count(self) -> int:
+        return self.store._collection.count()
+
+    def persist(self):
+        self.store.persist()
+
+    def drop(self):
+        self.store.delete_collection()
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _hash_ids(ids) -> np.ndarray:
+    return np.fromiter((_hash64(cid) for cid in ids), dtype=np.uint64, count=len(ids))
+
+
+def _hash_value(value) -> int:
+    # 0 marks a row without the key, so a real value never hashes to it
+    if value is None:
+        return 0
+    return _hash64(json.dumps(value, sort_keys=True)) or 1
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Exact-search backend: L2-normalised vectors in one contiguous float16 or
+    int8 (per-row scale) matrix that is memory-mapped for queries. Every other
+    per-row structure is an append-only file of the same generation, so
+    neither opening nor persisting reads or writes anything per row:
+
+    - ids: 64-bit hashes of the chunk ids, sorted lazily for lookups
+    - col-<key>: 64-bit hashes of one metadata value per row, for filters
+    - documents: JSONL of [chunk id, text, metadata] addressed by offsets
+    - deleted: tombstoned row numbers, in delete order
+
+    meta.json only commits row, byte and tombstone counts; anything past them
+    belongs to a writer that did not persist. Compaction writes a new generation
+    and removes the older ones once the new meta is persisted; an open backend
+    maps its generation's files up front, so it keeps reading them after that.
+    """
+
+    name = "numpy"
+    META_FILE = "meta.json"
+    FORMAT = 2
+
+    def __init__(self, directory: str, dtype: str = NUMPY_VECTOR_DTYPE):
+        self.directory = directory
+        meta = self._read_meta()
+        self.dtype = meta.get("dtype", dtype)
+        if self.dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported NUMPY_VECTOR_DTYPE: {self.dtype}")
+        self.dim = meta.get("dim")
+        self.generation = meta.get("generation", 0)
+        self.rows = meta.get("rows", 0)
+        self.documents_bytes = meta.get("documents_bytes", 0)
+        self.tombstones = meta.get("tombstones", 0)
+        self.columns = meta.get("columns", [])
+        self._pending_deletes = []
+        self._alive = np.ones(self.rows, dtype=bool)
+        self._alive[self._load_deleted()] = False
+        self.dead = self.tombstones
+        self._reset_index()
+        self._invalidate_maps()
+        self._truncated = False
+        self._documents = None
+        self._pin()
+
+    # ----- files -----
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _data_path(self, name: str, generation: int | None = None) -> str:
+        generation = self.generation if generation is None else generation
+        return self._path(f"{name}.{generation}.bin")
+
+    @staticmethod
+    def _column_file(key: str) -> str:
+        return "col-" + hashlib.blake2b(key.encode("utf-8"), digest_size=6).hexdigest()
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._path(self.META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        meta = {
+            "format": self.FORMAT,
+            "generation": self.generation,
+            "dtype": self.dtype,
+            "dim": self.dim,
+            "rows": self.rows,
+            "documents_bytes": self.documents_bytes,
+            "tombstones": self.tombstones,
+            "columns": self.columns,
+        }
+        tmp_path = self._path(f"{self.META_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(self.META_FILE))
+
+    def _load_deleted(self) -> np.ndarray:
+        path = self._data_path("deleted")
+        if self.tombstones == 0 or not os.path.exists(path):
+            return np.zeros(0, dtype=np.int64)
+        return np.fromfile(path, dtype=np.int64, count=self.tombstones)
+
+    def _map(self, name: str, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._data_path(name), dtype=dtype, mode="r", shape=shape)
+
+    def _cached_map(self, name: str, dtype, shape):
+        if name not in self._maps:
+            self._maps[name] = self._map(name, dtype, shape)
+        return self._maps[name]
+
+    @property
+    def matrix(self):
+        return self._cached_map("vectors", np.dtype(self.dtype), (self.rows, self.dim or 0))
+
+    @property
+    def scales(self):
+        return self._cached_map("scales", np.float32, (self.rows,))
+
+    @property
+    def offsets(self):
+        return self._cached_map("offsets", np.int64, (self.rows,))
+
+    @property
+    def id_hashes(self):
+        return self._cached_map("ids", np.uint64, (self.rows,))
+
+    def _column(self, key: str) -> np.ndarray:
+        if key not in self.columns:
+            return np.zeros(self.rows, dtype=np.uint64)
+        return self._cached_map(self._column_file(key), np.uint64, (self.rows,))
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._alive[:self.rows]
+
+    def _invalidate_maps(self):
+        self._maps = {}
+
+    def _pin(self):
+        """Map this generation's files now, so their removal by a compacting writer cannot pull them away."""
+        if self.rows == 0:
+            return
+        self.matrix, self.scales, self.offsets, self.id_hashes
+        for key in self.columns:
+            self._column(key)
+        self._documents_file()
+
+    def _documents_file(self):
+        if self._documents is None:
+            self._documents = open(self._data_path("documents"), "rb")
+        return self._documents
+
+    def _truncate_to_meta(self):
+        """Drop rows a crashed writer appended after the last persist."""
+        if self._truncated:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        row_bytes = (self.dim or 0) * np.dtype(self.dtype).itemsize
+        sizes = {
+            "vectors": self.rows * row_bytes,
+            "scales": self.rows * 4,
+            "offsets": self.rows * 8,
+            "ids": self.rows * 8,
+            "documents": self.documents_bytes,
+            "deleted": self.tombstones * 8,
+            **{self._column_file(key): self.rows * 8 for key in self.columns},
+        }
+        for name, size in sizes.items():
+            path = self._data_path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        self._truncated = True
+
+    # ----- id lookups -----
+
+    def _reset_index(self):
+        self._index_hashes = np.zeros(0, dtype=np.uint64)
+        self._index_rows = np.zeros(0, dtype=np.int64)
+        self._indexed = 0
+
+    def _build_index(self):
+        hashes = np.array(self.id_hashes)
+        order = np.argsort(hashes, kind="stable")
+        self._index_hashes, self._index_rows = hashes[order], order
+        self._indexed = self.rows
+
+    def _candidate_rows(self, hashes: np.ndarray) -> np.ndarray:
+        """Rows, live or dead, whose id hash is one of `hashes`."""
+        # Rows appended since the sorted index was built are scanned directly
+        # until the tail is large enough to be worth re-sorting
+        if self.rows - self._indexed > max(NUMPY_QUERY_BLOCK_ROWS, self._indexed // 8):
+            self._build_index()
+        left = np.searchsorted(self._index_hashes, hashes, side="left")
+        right = np.searchsorted(self._index_hashes, hashes, side="right")
+        found = [self._index_rows[lo:hi] for lo, hi in zip(left, right) if hi > lo]
+        tail = np.asarray(self.id_hashes[self._indexed:self.rows])
+        found.append(self._indexed + np.flatnonzero(np.isin(tail, hashes)))
+        return np.concatenate(found)
+
+    def _live_rows(self, ids) -> dict:
+        """chunk id -> its live row, for the ids that have one."""
+        ids = list(dict.fromkeys(ids))
+        if not ids or self.rows == 0:
+            return {}
+        rows = self._candidate_rows(_hash_ids(ids))
+        rows = np.sort(rows[self.alive[rows]])
+        # Hashes only narrow the search; the stored id settles it
+        wanted = set(ids)
+        return {
+            record[0]: int(row)
+            for row, record in zip(rows, self._read_records(rows))
+            if record[0] in wanted
+        }
+
+    # ----- writes -----
+
+    def _quantize(self, vectors: np.ndarray):
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1).astype(np.float32)
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None] * 127).astype(np.int8)
+        return quantized, scales / 127
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        self._truncate_to_meta()
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        rows, scales = self._quantize(vectors / norms)
+        self.delete(ids)
+        self._append(ids, rows, scales, documents, [metadata or {} for metadata in metadatas])
+
+    def _append(self, ids, rows: np.ndarray, scales: np.ndarray, documents, metadatas):
+        start = self.rows
+        offsets = []
+        with open(self._data_path("documents"), "ab") as f:
+            for record in zip(ids, documents, metadatas):
+                offsets.append(self.documents_bytes)
+                line = (json.dumps(record) + "\n").encode("utf-8")
+                f.write(line)
+                self.documents_bytes += len(line)
+        with open(self._data_path("vectors"), "ab") as f:
+            f.write(rows.tobytes())
+        with open(self._data_path("scales"), "ab") as f:
+            f.write(scales.tobytes())
+        with open(self._data_path("offsets"), "ab") as f:
+            f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        with open(self._data_path("ids"), "ab") as f:
+            f.write(_hash_ids(ids).tobytes())
+
+        for key in sorted(set().union(*metadatas) - set(self.columns)):
+            # A key seen for the first time is absent from every earlier row
+            with open(self._data_path(self._column_file(key)), "wb") as f:
+                f.truncate(start * 8)
+            self.columns.append(key)
+        for key in self.columns:
+            values = np.fromiter((_hash_value(m.get(key)) for m in metadatas), dtype=np.uint64, count=len(ids))
+            with open(self._data_path(self._column_file(key)), "ab") as f:
+                f.write(values.tobytes())
+
+        self.rows += len(ids)
+        if self.rows > len(self._alive):
+            grown = np.ones(max(self.rows, 2 * len(self._alive)), dtype=bool)
+            grown[:start] = self._alive[:start]
+            self._alive = grown
+        self._alive[start:self.rows] = True
+        self._invalidate_maps()
+
+    def delete(self, ids):
+        rows = list(self._live_rows(ids).values())
+        if rows:
+            self._alive[rows] = False
+            self._pending_deletes.extend(rows)
+            self.dead += len(rows)
+
+    def persist(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._truncate_to_meta()
+        compacted = bool(self.rows) and self.dead / self.rows > NUMPY_COMPACTION_RATIO
+        if compacted:
+            self._compact()
+        elif self._pending_deletes:
+            with open(self._data_path("deleted"), "ab") as f:
+                f.write(np.asarray(self._pending_deletes, dtype=np.int64).tobytes())
+            self.tombstones += len(self._pending_deletes)
+        self._pending_deletes = []
+        self._write_meta()
+        if compacted:
+            # Nothing opens the previous generation once meta points past it
+            self._remove_older_generations()
+
+    def _live_blocks(self):
+        """(ids, vectors, scales, texts, metadatas) of the live rows, a block at a time."""
+        live = np.flatnonzero(self.alive)
+        for start in range(0, len(live), NUMPY_QUERY_BLOCK_ROWS):
+            rows = live[start:start + NUMPY_QUERY_BLOCK_ROWS]
+            records = self._read_records(rows)
+            yield (
+                [record[0] for record in records],
+                np.array(self.matrix[rows]),
+                np.array(self.scales[rows]),
+                [record[1] for record in records],
+                [record[2] for record in records],
+            )
+
+    def _rewrite(self, blocks):
+        """Write `blocks` as the next generation and switch to it."""
+        self.generation += 1
+        self.rows = self.documents_bytes = self.tombstones = self.dead = 0
+        self.columns = []
+        self._alive = np.ones(0, dtype=bool)
+        self._pending_deletes = []
+        self._reset_index()
+        self._invalidate_maps()
+        self._documents = None
+        # Leftovers of a rewrite that crashed before its meta was written
+        self._remove_generation(self.generation)
+        for ids, rows, scales, texts, metadatas in blocks:
+            self._append(ids, rows, scales, texts, metadatas)
+
+    def _remove_generation(self, generation: int):
+        for name in os.listdir(self.directory):
+            if name.endswith(f".{generation}.bin"):
+                os.remove(self._path(name))
+
+    def _remove_older_generations(self):
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[2] == "bin" and parts[1].isdigit() and int(parts[1]) < self.generation:
+                os.remove(self._path(name))
+
+    def _compact(self):
+        # Blocks are read from the current generation while the next one is written
+        self._rewrite(list(self._live_blocks()))
+
+    # ----- reads -----
+
+    def _read_records(self, rows) -> list:
+        """[chunk id, text, metadata] per row."""
+        if len(rows) == 0:
+            return []
+        offsets = self.offsets
+        fd = self._documents_file().fileno()
+        records = []
+        for row in rows:
+            # Records are written in row order, so each ends where the next row's begins
+            start = int(offsets[row])
+            end = int(offsets[row + 1]) if row + 1 < self.rows else self.documents_bytes
+            # pread keeps concurrent readers from sharing a file position
+            records.append(json.loads(os.pread(fd, end - start, start)))
+        return records
+
+    def _to_documents(self, rows):
+        records = self._read_records(rows)
+        return to_documents(*zip(*records)) if records else []
+
+    def _filter_mask(self, filters: dict | None) -> np.ndarray:
+        mask = self.alive.copy()
+        for key, condition in (filters or {}).items():
+            column = self._column(key)
+            if isinstance(condition, dict):
+                if "$eq" in condition:
+                    mask &= column == np.uint64(_hash_value(condition["$eq"]))
+                elif "$in" in condition:
+                    mask &= np.isin(column, np.array([_hash_value(v) for v in condition["$in"]], dtype=np.uint64))
+                else:
+                    raise ValueError(f"Unsupported filter operator for numpy backend: {condition}")
+            else:
+                mask &= column == np.uint64(_hash_value(condition))
+        return mask
+
+    def query_many(self, embeddings, k: int, filters: dict | None = None):
+        n_rows = self.rows
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if n_rows == 0 or self.dim is None:
+            return [[] for _ in queries]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        mask = self._filter_mask(filters)
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return [[] for _ in queries]
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, n_rows, NUMPY_QUERY_BLOCK_ROWS):
+            end = min(start + NUMPY_QUERY_BLOCK_ROWS, n_rows)
+            block = np.asarray(self.matrix[start:end], dtype=np.float32)
+            scores = queries @ block.T
+            if self.dtype == "int8":
+                scores *= np.asarray(self.scales[start:end])[None, :]
+            scores[:, ~mask[start:end]] = -np.inf
+            # Keep only each query's running top-k across blocks
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append(self._to_documents([int(rows[i]) for i in order if np.isfinite(scores[i])]))
+        return results
+
+    def get(self, ids, filters: dict | None = None) -> dict:
+        found = self._live_rows(ids)
+        mask = self._filter_mask(filters) if filters else None
+        rows = [found[cid] for cid in dict.fromkeys(ids) if cid in found and (mask is None or mask[found[cid]])]
+        return dict(self._to_documents(rows))
+
+    def count(self) -> int:
+        return self.rows - self.dead
+
+    def drop(self):
+        self._invalidate_maps()
+        self._documents = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def open_vector_backend(codebase_id: str, backend: str | None = None, embedding_function=None) -> VectorBackend:
+    backend = backend or VECTOR_BACKEND
+    if backend == "chroma":
+        return ChromaBackend(codebase_id, embedding_function)
+    if backend == "numpy":
+        return NumpyBackend(os.path.join(codebase_state_dir(codebase_id), "vectors"))
+    raise ValueError(f"Unknown vector backend: {backend}")
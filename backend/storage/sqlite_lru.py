@@ -0,0 +1,123 @@
+# storage/sqlite_lru.py
+#
+# The SQLite table behind the on-disk caches: rows keyed by a hash within a
+# scope (model, prompt version, ...), a last_used column for LRU eviction and
+# an entry cap. Callers own the schema and what the value column holds.
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Evict a little below the cap so we don't run a DELETE on every insert at the limit
+EVICTION_HEADROOM = 0.9
+# SQLite caps bound parameters, so keys are looked up in slices
+LOOKUP_BATCH = 500
+
+
+def sha256_hex(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SQLiteLRU:
+    """
+    Size-capped LRU table. `schema` creates `table` with a REAL `last_used`
+    column; rows are found by equality on scope columns plus `key_column`,
+    and `value_column` is returned for hits.
+    """
+
+    def __init__(self, path: str, table: str, schema: str, key_column: str, value_column: str, max_entries: int):
+        self.path = path
+        self.table = table
+        self.key_column = key_column
+        self.value_column = value_column
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(schema)
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_used ON {table} (last_used)")
+        self._conn.commit()
+        # Upper bound on the row count; replacing a row does not grow the table,
+        # so the real count is only taken once the bound passes the cap
+        self._count_bound = self._count()
+
+    def _count(self) -> int:
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def get_many(self, scope: dict, keys: list[str]) -> list:
+        """Values for `keys` within `scope`, None for misses; hits are marked as used."""
+        where = "".join(f"{column} = ? AND " for column in scope)
+        found = {}
+        with self._lock:
+            distinct = list(dict.fromkeys(keys))
+            for start in range(0, len(distinct), LOOKUP_BATCH):
+                batch = distinct[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT {self.key_column}, {self.value_column} FROM {self.table} "
+                    f"WHERE {where}{self.key_column} IN ({placeholders})",
+                    [*scope.values(), *batch],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_used = ? WHERE {where}{self.key_column} = ?",
+                    [(now, *scope.values(), key) for key in found],
+                )
+                self._conn.commit()
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, rows: list[dict]):
+        """Insert or replace rows given as {column: value}, without last_used."""
+        if not rows:
+            return
+        columns = [*rows[0], "last_used"]
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                [(*row.values(), now) for row in rows],
+            )
+            self._count_bound += len(rows)
+            if self._count_bound > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._count()
+        target = int(self.max_entries * EVICTION_HEADROOM)
+        # Trimming to the headroom whenever we recount spaces recounts out by at least that many inserts
+        if count > target:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"(SELECT rowid FROM {self.table} ORDER BY last_used ASC LIMIT ?)",
+                (count - target,),
+            )
+            count = target
+        self._count_bound = count
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._count()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
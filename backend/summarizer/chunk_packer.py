@@ -0,0 +1,78 @@
+# summarizer/chunk_packer.py
+#
+# Several chunks, from one file or many, share one summarization request:
+# the system prompt and round trip are paid once per pack instead of per chunk.
+
+import os
+import re
+import json
+from llm.tokens import count_tokens
+
+SUMMARY_PACKING = os.getenv("SUMMARY_PACKING", "1") == "1"
+# Prompt plus expected answer per request; the default leaves room in an 8k context
+SUMMARY_PACK_MAX_TOKENS = int(os.getenv("SUMMARY_PACK_MAX_TOKENS", "6000"))
+SUMMARY_PACK_MAX_ITEMS = int(os.getenv("SUMMARY_PACK_MAX_ITEMS", "24"))
+# Answer tokens reserved per item when sizing a pack
+SUMMARY_OUTPUT_TOKENS_PER_ITEM = int(os.getenv("SUMMARY_OUTPUT_TOKENS_PER_ITEM", "250"))
+# Ask for a JSON object response; only models with JSON mode accept it
+SUMMARY_JSON_MODE = os.getenv("SUMMARY_JSON_MODE", "0") == "1"
+
+PACK_INSTRUCTIONS = (
+    "You will receive several numbered code items, each starting with a line '### ITEM <number>'. "
+    "Summarize every item separately. Reply with only a JSON object of the form "
+    '{"summaries": [{"id": <number>, "summary": "<summary>"}]}, one entry per item.'
+)
+ITEM_HEADER = "### ITEM {}"
+# Bump when PACK_INSTRUCTIONS or the item layout change
+PACK_PROMPT_VERSION = "1"
+
+
+def item_cost(chunk: str) -> int:
+    return count_tokens(ITEM_HEADER.format(0) + "\n" + chunk) + SUMMARY_OUTPUT_TOKENS_PER_ITEM
+
+
+def pack_chunks(items: list, max_tokens: int = SUMMARY_PACK_MAX_TOKENS, max_items: int = SUMMARY_PACK_MAX_ITEMS):
+    """
+    Group (chunk, payload) items, in order, into packs that fit `max_tokens`
+    including the answer allowance. A pack is only closed when the next item
+    would not fit; an item over the budget on its own gets a pack to itself.
+    """
+    if not SUMMARY_PACKING:
+        max_items = 1
+    pack, pack_tokens = [], 0
+    for item in items:
+        tokens = item_cost(item[0])
+        if pack and (pack_tokens + tokens > max_tokens or len(pack) >= max_items):
+            yield pack
+            pack, pack_tokens = [], 0
+        pack.append(item)
+        pack_tokens += tokens
+    if pack:
+        yield pack
+
+
+def build_pack_prompt(chunks: list[str]) -> str:
+    return "\n\n".join(f"{ITEM_HEADER.format(number)}\n{chunk}" for number, chunk in enumerate(chunks, start=1))
+
+
+def parse_pack_response(text: str, count: int) -> list[str | None]:
+    """Per-item summaries in item order; None for items the response left out or mangled."""
+    # Models without JSON mode may wrap the object in prose or a code fence
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        data = None
+    entries = data.get("summaries") if isinstance(data, dict) else None
+    summaries = [None] * count
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            number = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        summary = entry.get("summary")
+        if 1 <= number <= count and isinstance(summary, str) and summary.strip():
+            summaries[number - 1] = summary.strip()
+    return summaries
@@ -0,0 +1,74 @@
+# summarizer/summary_cache.py
+
+import os
+import threading
+from storage.sqlite_lru import SQLiteLRU, sha256_hex
+
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join("cache", "summaries.sqlite3"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "200000"))
+
+
+class SummaryCache:
+    """
+    Disk-backed LRU cache of summaries keyed by (kind, sha256(content), model,
+    prompt version). `kind` separates chunk summaries from whole-file ones.
+    """
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        self.table = SQLiteLRU(
+            path,
+            "summaries",
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                kind TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (kind, content_hash, model, prompt_version)
+            )
+            """,
+            key_column="content_hash",
+            value_column="summary",
+            max_entries=max_entries,
+        )
+
+    def get_many(self, kind: str, contents: list[str], model: str, prompt_version: str) -> list[str | None]:
+        scope = {"kind": kind, "model": model, "prompt_version": prompt_version}
+        return self.table.get_many(scope, [sha256_hex(content) for content in contents])
+
+    def get(self, kind: str, content: str, model: str, prompt_version: str) -> str | None:
+        return self.get_many(kind, [content], model, prompt_version)[0]
+
+    def put_many(self, kind: str, model: str, entries: list[tuple[str, str, str]]):
+        """Store (content, prompt_version, summary) entries."""
+        self.table.put_many([
+            {
+                "kind": kind,
+                "content_hash": sha256_hex(content),
+                "model": model,
+                "prompt_version": prompt_version,
+                "summary": summary,
+            }
+            for content, prompt_version, summary in entries
+        ])
+
+    def put(self, kind: str, content: str, model: str, prompt_version: str, summary: str):
+        self.put_many(kind, model, [(content, prompt_version, summary)])
+
+    def stats(self) -> dict:
+        return self.table.stats()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """Process-wide cache shared by /summary and /pdf."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SummaryCache()
+        return _cache
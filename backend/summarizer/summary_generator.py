@@ -1,18 +1,40 @@
 # summarizer/summary_generator.py
 
 import os
+import json
 import asyncio
+import logging
 import aiofiles
-from openai import AsyncOpenAI
+from llm.client import chat_text
+from summarizer.summary_cache import get_summary_cache
+from summarizer.chunk_packer import (
+    pack_chunks, build_pack_prompt, parse_pack_response, PACK_INSTRUCTIONS, PACK_PROMPT_VERSION, SUMMARY_JSON_MODE,
+    SUMMARY_PACKING,
+)
+from dataclasses import asdict
+from summarizer.summary_model import CodebaseSummary, FileSummary, ChunkSummary, CODEBASE_SUMMARY_TITLE
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import difflib
 
 SUPPORTED_EXTENSIONS = [".py", ".js", ".java"]
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4")
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 100
+# Summarization requests in flight at once across all files of a run
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+# Files open at once while a run reads its sources; keeps large repositories under the fd limit
+SUMMARY_FILE_READ_CONCURRENCY = int(os.getenv("SUMMARY_FILE_READ_CONCURRENCY", "16"))
+SUMMARY_CACHE = os.getenv("SUMMARY_CACHE", "1") == "1"
+# Bump when the summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "1"
+# Packed answers come from a different prompt, so they are cached under their own version
+PACKED_PROMPT_VERSION = f"{SUMMARY_PROMPT_VERSION}+pack{PACK_PROMPT_VERSION}"
+# Whole-file entries may mix both kinds of chunk summary
+FILE_PROMPT_VERSION = f"{SUMMARY_PROMPT_VERSION}/{PACKED_PROMPT_VERSION}"
+# Longest a /summary stream stays silent before sending a progress event
+SUMMARY_HEARTBEAT_SECONDS = float(os.getenv("SUMMARY_HEARTBEAT_SECONDS", "15"))
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
 
 def collect_code_files(codebase_path: str):
     files = []
@@ -29,52 +51,245 @@ def chunk_code(content: str):
     )
     return splitter.split_text(content)
 
+SYSTEM_PROMPT = (
+    "You are an expert software engineer. Summarize the following code as if writing a tutorial for a beginner."
+)
+
 async def summarize_chunk(chunk: str) -> str:
-    system_prompt = (
-        "You are an expert software engineer. Summarize the following code as if writing a tutorial for a beginner."
-    )
-    response = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_prompt},
+    return await chat_text(
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": chunk},
         ],
-        stream=True,
+        SUMMARY_MODEL,
     )
 
-    summary = ""
-    async for part in response:
-        delta = part.choices[0].delta.content or ""
-        summary += delta
-    return summary.strip()
+async def summarize_pack(chunks: list[str]) -> list[str | None]:
+    """Summaries of several chunks from one request, in order; None where the response has no usable entry."""
+    if len(chunks) == 1:
+        return [await summarize_chunk(chunks[0])]
+    options = {"response_format": {"type": "json_object"}} if SUMMARY_JSON_MODE else {}
+    text = await chat_text(
+        [
+            {"role": "system", "content": f"{SYSTEM_PROMPT} {PACK_INSTRUCTIONS}"},
+            {"role": "user", "content": build_pack_prompt(chunks)},
+        ],
+        SUMMARY_MODEL,
+        **options,
+    )
+    return parse_pack_response(text, len(chunks))
+
+class ChunkPacker:
+    """
+    Summarizes the chunks of a whole run in as few requests as the token
+    budget allows. Chunks are queued while files are read; start() packs the
+    queue in order and sends packs `concurrency` at a time. Each submitted
+    chunk gets a future resolving to its summary, or None if it failed.
+    """
+
+    def __init__(self, concurrency: int = SUMMARY_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.cache = get_summary_cache() if SUMMARY_CACHE else None
+        self.requests = 0
+        self._queue = []
+        self._futures = []
+        self._tasks = []
+
+    def _cached(self, chunks: list[str]) -> list[str | None]:
+        # Either prompt's summary of the same chunk will do
+        cached = self.cache.get_many("chunk", chunks, SUMMARY_MODEL, SUMMARY_PROMPT_VERSION)
+        missing = [i for i, summary in enumerate(cached) if summary is None]
+        if missing and SUMMARY_PACKING:
+            packed = self.cache.get_many("chunk", [chunks[i] for i in missing], SUMMARY_MODEL, PACKED_PROMPT_VERSION)
+            for i, summary in zip(missing, packed):
+                cached[i] = summary
+        return cached
 
-async def summarize_file(file_path: str) -> str:
+    async def submit(self, chunks: list[str]) -> list[asyncio.Future]:
+        """Queue a file's chunks; those already in the cache resolve at once."""
+        cached = [None] * len(chunks)
+        if self.cache is not None and chunks:
+            # One SQLite round trip per file, off the event loop
+            cached = await asyncio.to_thread(self._cached, chunks)
+        loop = asyncio.get_running_loop()
+        futures = []
+        for chunk, summary in zip(chunks, cached):
+            future = loop.create_future()
+            if summary is not None:
+                future.set_result(summary)
+            else:
+                self._queue.append((chunk, future))
+            futures.append(future)
+        self._futures.extend(futures)
+        return futures
+
+    def start(self):
+        for pack in pack_chunks(self._queue):
+            self._tasks.append(asyncio.ensure_future(self._run(pack)))
+        self._queue = []
+
+    async def _request(self, chunks: list[str]) -> list[str | None]:
+        async with self.semaphore:
+            self.requests += 1
+            try:
+                return await summarize_pack(chunks)
+            except Exception as e:
+                # A failed request leaves gaps in its files' summaries instead of failing the run
+                logger.warning("Summary request for %d chunk(s) failed: %s", len(chunks), e)
+                return [None] * len(chunks)
+
+    async def _run(self, pack: list):
+        chunks = [chunk for chunk, _ in pack]
+        summaries = await self._request(chunks)
+        versions = [PACKED_PROMPT_VERSION if len(chunks) > 1 else SUMMARY_PROMPT_VERSION] * len(chunks)
+        if len(chunks) > 1:
+            # Items the packed answer dropped are asked for one at a time
+            missing = [i for i, summary in enumerate(summaries) if summary is None]
+            retried = await asyncio.gather(*(self._request([chunks[i]]) for i in missing))
+            for i, (summary,) in zip(missing, retried):
+                summaries[i], versions[i] = summary, SUMMARY_PROMPT_VERSION
+        for (_, future), summary in zip(pack, summaries):
+            if not future.done():
+                future.set_result(summary)
+        entries = [
+            (chunk, version, summary)
+            for (chunk, _), summary, version in zip(pack, summaries, versions)
+            if summary is not None
+        ]
+        if self.cache is not None and entries:
+            await asyncio.to_thread(self.cache.put_many, "chunk", SUMMARY_MODEL, entries)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+        for future in self._futures:
+            future.cancel()
+
+async def _load_file(file_path: str, packer: ChunkPacker, root: str | None = None):
+    """
+    Read a file and queue its uncached chunks with the packer. Returns the
+    FileSummary and, unless it came whole from the cache, what _finish_file needs.
+    """
     async with aiofiles.open(file_path, "r", encoding="utf-8", errors="ignore") as f:
         content = await f.read()
 
-    chunks = chunk_code(content)
-    file_summary = f"### Summary for `{os.path.basename(file_path)}`\n\n"
-    for chunk in chunks:
-        summary = await summarize_chunk(chunk)
-        file_summary += f"- {summary}\n"
-    return file_summary
+    result = FileSummary(
+        path=os.path.relpath(file_path, root) if root else os.path.basename(file_path),
+        name=os.path.basename(file_path),
+    )
+    # An unchanged file skips chunking and per-chunk lookups; the key covers how it was chunked
+    file_key = f"{CHUNK_SIZE}:{CHUNK_OVERLAP}\n{content}"
+    if packer.cache is not None:
+        cached = await asyncio.to_thread(packer.cache.get, "file_chunks", file_key, SUMMARY_MODEL, FILE_PROMPT_VERSION)
+        if cached is not None:
+            result.chunks = [ChunkSummary(i, text) for i, text in enumerate(json.loads(cached))]
+            result.cached = True
+            return result, None
+    return result, (file_key, await packer.submit(chunk_code(content)))
+
+async def _finish_file(result: FileSummary, pending, packer: ChunkPacker) -> FileSummary:
+    if pending is None:
+        return result
+    file_key, futures = pending
+    # gather keeps the chunk order whatever order the summaries finish in
+    summaries = await asyncio.gather(*futures)
+    result.chunks = [ChunkSummary(i, text) for i, text in enumerate(summaries)]
+    if packer.cache is not None and not result.failed_chunks:
+        await asyncio.to_thread(
+            packer.cache.put, "file_chunks", file_key, SUMMARY_MODEL, FILE_PROMPT_VERSION, json.dumps(summaries)
+        )
+    return result
 
-async def generate_summaries(path: str) -> str:
+def _summary_files(path: str) -> tuple[str | None, list[str], str | None]:
     if os.path.isfile(path):
-        return await summarize_file(path)
-
+        return None, [path], None
     if os.path.isdir(path):
-        files = collect_code_files(path)
-        if not files:
-            return "No supported code files found."
+        return path, sorted(collect_code_files(path)), CODEBASE_SUMMARY_TITLE
+    raise ValueError(f"Path '{path}' is neither a file nor a folder.")
 
-        all_summaries = "# Codebase Tutorial Summary\n\n"
-        for f in files:
-            summary = await summarize_file(f)
-            all_summaries += summary + "\n\n"
-        return all_summaries
+async def _load_files(files: list[str], root: str | None, packer: ChunkPacker) -> list:
+    """_load_file over all files with at most SUMMARY_FILE_READ_CONCURRENCY open at once, in file order."""
+    loaded = [None] * len(files)
+    indexes = iter(range(len(files)))
 
-    raise ValueError(f"Path '{path}' is neither a file nor a folder.")
+    async def worker():
+        # Workers share one iterator, so each index is loaded exactly once
+        for index in indexes:
+            loaded[index] = await _load_file(files[index], packer, root)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(len(files), max(1, SUMMARY_FILE_READ_CONCURRENCY)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return loaded
+
+async def _start_run(files: list[str], root: str | None, packer: ChunkPacker) -> list:
+    # Every file is chunked before any request is sent, so packs can span files
+    loaded = await _load_files(files, root, packer)
+    packer.start()
+    return [asyncio.ensure_future(_finish_file(result, pending, packer)) for result, pending in loaded]
+
+async def generate_summaries(path: str, concurrency: int = SUMMARY_CONCURRENCY) -> CodebaseSummary:
+    root, files, title = _summary_files(path)
+    packer = ChunkPacker(concurrency)
+    tasks = []
+    try:
+        tasks = await _start_run(files, root, packer)
+        summaries = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        packer.cancel()
+    return CodebaseSummary(root=path, files=list(summaries), title=title, llm_requests=packer.requests)
+
+async def stream_summaries(
+    path: str,
+    concurrency: int = SUMMARY_CONCURRENCY,
+    is_disconnected=None,
+    poll_seconds: float = 0.5,
+):
+    """
+    Summarize like generate_summaries, yielding ("start", data), then
+    ("file", data) as each file finishes (with its `index` in the sorted file
+    list and running counters), ("progress", data) after SUMMARY_HEARTBEAT_SECONDS
+    without a finished file, and ("done", data). Stops, cancelling the
+    outstanding LLM calls, once `await is_disconnected()` is true.
+    """
+    root, files, title = _summary_files(path)
+    loop = asyncio.get_running_loop()
+    started = last_event = loop.time()
+    progress = {"files_total": len(files), "files_done": 0, "chunks_done": 0, "failed_chunks": 0, "cached_files": 0}
+    yield "start", {"root": path, "title": title, **progress}
+
+    packer = ChunkPacker(concurrency)
+    tasks = {}
+    try:
+        tasks = {task: index for index, task in enumerate(await _start_run(files, root, packer))}
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+            if is_disconnected is not None and await is_disconnected():
+                return
+            for task in sorted(done, key=tasks.get):
+                file = task.result()
+                progress["files_done"] += 1
+                progress["chunks_done"] += len(file.chunks)
+                progress["failed_chunks"] += file.failed_chunks
+                progress["cached_files"] += file.cached
+                last_event = loop.time()
+                yield "file", {"index": tasks[task], "file": asdict(file), **progress, "llm_requests": packer.requests}
+            if not done and loop.time() - last_event >= SUMMARY_HEARTBEAT_SECONDS:
+                # Keeps idle-timeout proxies from closing the stream while a large file is summarized
+                last_event = loop.time()
+                yield "progress", {**progress, "llm_requests": packer.requests, "seconds": round(last_event - started, 1)}
+    finally:
+        for task in tasks:
+            task.cancel()
+        packer.cancel()
+
+    yield "done", {**progress, "llm_requests": packer.requests, "seconds": round(loop.time() - started, 3)}
 
 def compute_diff(original: str, modified: str) -> str:
     original_lines = original.splitlines(keepends=True)
@@ -96,10 +311,4 @@ async def generate_impact_summary(modified_code: str, original_code: str | None
             f"{modified_code}"
         )
 
-    res = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
-
-    return res.choices[0].message.content.strip()
\ No newline at end of file
+    return await chat_text([{"role": "user", "content": prompt}], SUMMARY_MODEL, temperature=0.2)
\ No newline at end of file
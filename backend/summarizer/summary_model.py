@@ -0,0 +1,71 @@
+# summarizer/summary_model.py
+#
+# What the summarizer produces: codebase -> files -> chunk summaries. The PDF
+# builder and the API read these directly; markdown is one serializer of them.
+
+from dataclasses import dataclass, field, asdict
+
+CODEBASE_SUMMARY_TITLE = "Codebase Tutorial Summary"
+NO_FILES_MESSAGE = "No supported code files found."
+
+
+@dataclass(slots=True)
+class ChunkSummary:
+    index: int
+    # None when the LLM call failed for this chunk
+    text: str | None
+
+    @property
+    def failed(self) -> bool:
+        return self.text is None
+
+
+@dataclass(slots=True)
+class FileSummary:
+    path: str
+    name: str
+    chunks: list[ChunkSummary] = field(default_factory=list)
+    cached: bool = False
+
+    @property
+    def failed_chunks(self) -> int:
+        return sum(chunk.failed for chunk in self.chunks)
+
+
+@dataclass(slots=True)
+class CodebaseSummary:
+    root: str
+    files: list[FileSummary] = field(default_factory=list)
+    # None when a single file was summarized
+    title: str | None = CODEBASE_SUMMARY_TITLE
+    # Requests sent to the LLM; packing puts several chunks in one
+    llm_requests: int = 0
+
+    def stats(self) -> dict:
+        return {
+            "file_count": len(self.files),
+            "chunk_count": sum(len(f.chunks) for f in self.files),
+            "failed_chunks": sum(f.failed_chunks for f in self.files),
+            "cached_files": sum(f.cached for f in self.files),
+        }
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), **self.stats()}
+
+
+def chunk_text(chunk: ChunkSummary) -> str:
+    return chunk.text if chunk.text is not None else "_Summary unavailable_"
+
+
+def to_markdown(summary: CodebaseSummary) -> str:
+    if summary.title is not None and not summary.files:
+        return NO_FILES_MESSAGE
+    parts = []
+    if summary.title is not None:
+        parts.append(f"# {summary.title}\n\n")
+    for file in summary.files:
+        parts.append(f"### Summary for `{file.name}`\n\n")
+        parts.extend(f"- {chunk_text(chunk)}\n" for chunk in file.chunks)
+        if summary.title is not None:
+            parts.append("\n\n")
+    return "".join(parts)
@@ -0,0 +1,88 @@
+# tests/test_chunker.py
+
+from embedder.chunker import chunk_code
+from llm.tokens import count_tokens
+
+
+def tokens(text: str) -> int:
+    return sum(count_tokens(line + "\n") for line in text.splitlines())
+
+
+def line_range(text: str, start: int, end: int) -> str:
+    return "\n".join(text.splitlines()[start - 1:end])
+
+
+SOURCE = '''import os
+
+# Adds one.
+@decorator
+def add_one(x):
+    return x + 1
+
+class Account:
+    def deposit(self, amount):
+        self.balance += amount
+'''
+
+
+def test_empty_file_has_no_chunks():
+    assert chunk_code("", "empty.py") == []
+
+
+def test_small_definitions_share_one_chunk():
+    (chunk,) = chunk_code(SOURCE, "bank.py")
+    text, metadata = chunk
+    assert text == SOURCE.rstrip("\n")
+    assert metadata == {
+        "source": "bank.py",
+        "language": "python",
+        "symbols": "add_one,Account",
+        "start_line": 1,
+        "end_line": 10,
+    }
+
+
+def test_comments_and_decorators_stay_with_their_definition():
+    budget = tokens(line_range(SOURCE, 3, 6))
+    chunks = chunk_code(SOURCE, "bank.py", max_tokens=budget)
+    by_symbols = {metadata["symbols"]: metadata for _, metadata in chunks}
+    assert (by_symbols["add_one"]["start_line"], by_symbols["add_one"]["end_line"]) == (3, 6)
+
+
+def test_oversized_class_is_split_into_its_members():
+    methods = "".join(
+        f"    def method_{i}(self, value):\n"
+        f"        total = value * {i}\n"
+        f"        return total + self.offset_{i}\n\n"
+        for i in range(6)
+    )
+    source = "class Ledger:\n    offset = 0\n\n" + methods
+    budget = tokens(source) // 3
+    chunks = chunk_code(source, "ledger.py", max_tokens=budget)
+
+    assert len(chunks) > 1
+    symbols = {symbol for _, metadata in chunks for symbol in metadata["symbols"].split(",")}
+    assert {f"Ledger.method_{i}" for i in range(6)} <= symbols
+    for text, metadata in chunks:
+        assert tokens(text) <= budget
+        assert text == line_range(source, metadata["start_line"], metadata["end_line"])
+
+
+def test_unparseable_file_falls_back_to_line_windows():
+    source = "def broken(:\n" + "".join(f"value_{i} = compute({i}, {i} * 2)\n" for i in range(200))
+    budget = 60
+    chunks = chunk_code(source, "broken.py", max_tokens=budget)
+
+    assert len(chunks) > 1
+    assert all(metadata["symbols"] == "" for _, metadata in chunks)
+    assert all(tokens(text) <= budget for text, _ in chunks)
+    # Windows are contiguous and cover the whole file
+    assert chunks[0][1]["start_line"] == 1
+    assert chunks[-1][1]["end_line"] == len(source.splitlines())
+    for (_, previous), (_, current) in zip(chunks, chunks[1:]):
+        assert current["start_line"] == previous["end_line"] + 1
+
+
+def test_unknown_extension_has_no_language():
+    chunks = chunk_code("some notes\nmore notes\n", "NOTES.txt")
+    assert [metadata["language"] for _, metadata in chunks] == [""]
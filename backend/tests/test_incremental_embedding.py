@@ -0,0 +1,118 @@
+# tests/test_incremental_embedding.py
+
+import os
+import json
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("langchain")
+
+import embedder.embedder as embedder
+import retriever.vector_backends as vector_backends
+from embedder.manifest import load_manifest, save_manifest, stat_matches, chunk_id, MANIFEST_VERSION
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Index state lives under relative paths, so each test gets its own working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vector_backends, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(embedder, "VECTOR_BACKEND", "numpy")
+    codebase = tmp_path / "codebase"
+    codebase.mkdir()
+    return codebase
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+
+
+def embed(codebase, codebase_id="delta"):
+    return embedder.embed_codebase(str(codebase), codebase_id=codebase_id, embedding_provider="local")
+
+
+def manifest_files(codebase_id="delta") -> dict:
+    path = os.path.join(embedder.codebase_state_dir(codebase_id), embedder.MANIFEST_FILE)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def test_manifest_round_trip_and_version_check(tmp_path):
+    path = str(tmp_path / "state" / "manifest.json")
+    assert load_manifest(path, "repo")["files"] == {}
+
+    manifest = {"version": MANIFEST_VERSION, "codebase_path": "repo", "files": {"a.py": {"size": 1}}}
+    save_manifest(path, manifest)
+    assert load_manifest(path, "repo") == manifest
+
+    save_manifest(path, {**manifest, "version": MANIFEST_VERSION + 1})
+    assert load_manifest(path, "repo")["files"] == {}
+
+
+def test_stat_matches_and_chunk_id(tmp_path):
+    path = tmp_path / "a.py"
+    write(path, "x = 1\n")
+    stat = os.stat(path)
+    assert stat_matches({"size": stat.st_size, "mtime": stat.st_mtime_ns}, stat)
+    assert not stat_matches({"size": stat.st_size + 1, "mtime": stat.st_mtime_ns}, stat)
+    assert not stat_matches(None, stat)
+
+    assert chunk_id("a.py", 0, "x = 1") == chunk_id("a.py", 0, "x = 1")
+    assert len({chunk_id("a.py", 0, "x"), chunk_id("a.py", 1, "x"), chunk_id("b.py", 0, "x")}) == 3
+
+
+def test_unchanged_codebase_is_not_reembedded(workdir):
+    write(workdir / "a.py", "def a():\n    return 1\n")
+    write(workdir / "b.py", "def b():\n    return 2\n")
+    first = embed(workdir)
+    assert (first["files_added"], first["chunks_indexed"]) == (2, 2)
+
+    second = embed(workdir)
+    assert second["files_unchanged"] == 2
+    assert second["chunks_indexed"] == 0
+    assert second["index_version"] is None
+
+
+def test_delta_reembeds_only_changed_files(workdir):
+    write(workdir / "keep.py", "def keep():\n    return 1\n")
+    write(workdir / "touch.py", "def touch():\n    return 2\n")
+    write(workdir / "edit.py", "def edit():\n    return 3\n")
+    write(workdir / "gone.py", "def gone():\n    return 4\n")
+    embed(workdir)
+    before = manifest_files()
+
+    # Same content with a new mtime is recognised by its hash
+    os.utime(workdir / "touch.py", ns=(0, before["touch.py"]["mtime"] + 10**9))
+    write(workdir / "edit.py", "def edit():\n    return 30\n")
+    os.remove(workdir / "gone.py")
+    write(workdir / "new.py", "def new():\n    return 5\n")
+    result = embed(workdir)
+
+    assert result["files_unchanged"] == 2
+    assert result["files_changed"] == 1
+    assert result["files_added"] == 1
+    assert result["files_removed"] == 1
+    assert result["chunks_indexed"] == 2
+    assert result["chunks_deleted"] == 2
+
+    after = manifest_files()
+    assert sorted(after) == ["edit.py", "keep.py", "new.py", "touch.py"]
+    assert after["touch.py"]["chunk_ids"] == before["touch.py"]["chunk_ids"]
+    assert after["touch.py"]["mtime"] != before["touch.py"]["mtime"]
+    assert after["edit.py"]["chunk_ids"] != before["edit.py"]["chunk_ids"]
+
+    # The vector store holds exactly the chunks the manifest lists
+    backend = embedder.get_codebase_backend("delta")
+    live_ids = [cid for entry in after.values() for cid in entry["chunk_ids"]]
+    assert backend.count() == len(live_ids)
+    assert sorted(backend.get(live_ids)) == sorted(live_ids)
+    assert backend.get(before["gone.py"]["chunk_ids"] + before["edit.py"]["chunk_ids"]) == {}
+
+
+def test_full_run_ignores_the_manifest(workdir):
+    write(workdir / "a.py", "def a():\n    return 1\n")
+    embed(workdir)
+    result = embedder.embed_codebase(str(workdir), incremental=False, codebase_id="delta", embedding_provider="local")
+    assert result["files_unchanged"] == 0
+    assert result["files_changed"] == 1
+    assert embedder.get_codebase_backend("delta").count() == 1
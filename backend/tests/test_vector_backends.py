@@ -0,0 +1,145 @@
+# tests/test_vector_backends.py
+
+import os
+import pytest
+
+pytest.importorskip("langchain")
+
+from retriever.vector_backends import NumpyBackend
+
+DIM = 8
+
+
+def one_hot(i: int) -> list[float]:
+    vector = [0.0] * DIM
+    vector[i % DIM] = 1.0
+    return vector
+
+
+def fill(backend: NumpyBackend, n: int, source=lambda i: f"file_{i % 2}.py"):
+    ids = [f"chunk-{i}" for i in range(n)]
+    backend.upsert(ids, [one_hot(i) for i in range(n)], [f"text {i}" for i in range(n)],
+                   [{"source": source(i), "index": i} for i in range(n)])
+    return ids
+
+
+def top_id(backend: NumpyBackend, i: int, filters=None) -> str:
+    return backend.query(one_hot(i), 1, filters)[0][0]
+
+
+def data_files(directory: str) -> list[str]:
+    return sorted(name for name in os.listdir(directory) if name.endswith(".bin"))
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_writes_survive_reopen(tmp_path, dtype):
+    backend = NumpyBackend(str(tmp_path), dtype=dtype)
+    fill(backend, 4)
+    backend.persist()
+
+    reopened = NumpyBackend(str(tmp_path))
+    assert reopened.dtype == dtype
+    assert reopened.count() == 4
+    assert [top_id(reopened, i) for i in range(4)] == ["chunk-0", "chunk-1", "chunk-2", "chunk-3"]
+    document = reopened.get(["chunk-2"])["chunk-2"]
+    assert document.page_content == "text 2"
+    assert document.metadata == {"source": "file_0.py", "index": 2, "chunk_id": "chunk-2"}
+
+
+def test_unpersisted_writes_are_dropped_on_reopen(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    fill(backend, 2)
+    backend.persist()
+    backend.upsert(["late"], [one_hot(5)], ["late text"], [{"source": "late.py"}])
+
+    reopened = NumpyBackend(str(tmp_path))
+    assert reopened.count() == 2
+    assert reopened.get(["late"]) == {}
+
+
+def test_upsert_replaces_an_existing_id(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    fill(backend, 4)
+    backend.upsert(["chunk-1"], [one_hot(6)], ["rewritten"], [{"source": "file_1.py"}])
+    backend.persist()
+
+    reopened = NumpyBackend(str(tmp_path))
+    assert reopened.count() == 4
+    assert reopened.get(["chunk-1"])["chunk-1"].page_content == "rewritten"
+    assert top_id(reopened, 6) == "chunk-1"
+
+
+def test_filters_on_metadata(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    ids = fill(backend, 6)
+    backend.persist()
+
+    assert top_id(backend, 1, {"source": "file_0.py"}) != "chunk-1"
+    hits = backend.query(one_hot(0), 6, {"source": {"$in": ["file_1.py"]}})
+    assert sorted(cid for cid, _ in hits) == ["chunk-1", "chunk-3", "chunk-5"]
+    assert sorted(backend.get(ids, {"source": {"$eq": "file_0.py"}})) == ["chunk-0", "chunk-2", "chunk-4"]
+    assert backend.query(one_hot(0), 3, {"source": "missing.py"}) == []
+
+
+def test_deletes_are_kept_as_tombstones_below_the_compaction_ratio(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    fill(backend, 10)
+    backend.delete(["chunk-3"])
+    backend.persist()
+
+    reopened = NumpyBackend(str(tmp_path))
+    assert reopened.generation == 0
+    assert reopened.tombstones == 1
+    assert reopened.count() == 9
+    assert reopened.get(["chunk-3"]) == {}
+    assert "chunk-3" not in [cid for cid, _ in reopened.query(one_hot(3), 10)]
+
+
+def test_compaction_switches_generation_and_reopens(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    ids = fill(backend, 10)
+    backend.persist()
+    backend.delete(ids[:5])
+    backend.persist()
+
+    assert backend.generation == 1
+    assert all(name.endswith(".1.bin") for name in data_files(str(tmp_path)))
+
+    reopened = NumpyBackend(str(tmp_path))
+    assert reopened.generation == 1
+    assert reopened.tombstones == 0
+    assert reopened.count() == 5
+    assert sorted(reopened.get(ids)) == ids[5:]
+    assert [top_id(reopened, i) for i in range(5, 8)] == ["chunk-5", "chunk-6", "chunk-7"]
+    hits = reopened.query(one_hot(0), 10, {"source": "file_1.py"})
+    assert sorted(cid for cid, _ in hits) == ["chunk-5", "chunk-7", "chunk-9"]
+
+    # The new generation takes further writes like the first one did
+    reopened.upsert(["chunk-new"], [one_hot(2)], ["new"], [{"source": "file_0.py"}])
+    reopened.persist()
+    assert top_id(NumpyBackend(str(tmp_path)), 2) == "chunk-new"
+
+
+def test_reader_opened_before_compaction_keeps_its_generation(tmp_path):
+    writer = NumpyBackend(str(tmp_path))
+    ids = fill(writer, 10)
+    writer.persist()
+    reader = NumpyBackend(str(tmp_path))
+
+    writer.delete(ids[:8])
+    writer.persist()
+
+    assert reader.generation == 0
+    assert reader.count() == 10
+    assert top_id(reader, 0) == "chunk-0"
+    assert reader.get(["chunk-1"])["chunk-1"].page_content == "text 1"
+
+
+def test_drop_removes_the_directory(tmp_path):
+    directory = tmp_path / "vectors"
+    backend = NumpyBackend(str(directory))
+    fill(backend, 2)
+    backend.persist()
+    backend.drop()
+    assert not directory.exists()
+    assert NumpyBackend(str(directory)).count() == 0